@@ -5,6 +5,7 @@ method.
 MAIN MODULE - Contains the GUI mainloop and all the window definitions.
 '''
                     
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk, messagebox, Menu, filedialog, PhotoImage
 from canvas import drawingCanvas
@@ -105,6 +106,7 @@ def main():
         Sta.COMBINATIONSList = []
         Sta.permanent = [[], []]
         Sta.results, Sta.resultClick = [], [-1, 0]
+        Sta.baseResults, Sta.model, Sta.factorization = [], None, []
         Sta.actions, Sta.undone = [], []
         Sta.canvas.yview_moveto(0.475)
         Sta.scale, Sta.mouseAnchor = 1.0, [0, 0]
@@ -340,6 +342,7 @@ def main():
 
             for material in Sta.materialsList:
                 if material.name == name:
+                    Sta.model = None
                     material.elasticity = E
                     material.thermal = alpha
                     itemsList = matList.get_children()
@@ -379,6 +382,7 @@ def main():
                 material = next((material for material in Sta.materialsList
                                 if material.name == name), None)
                 Sta.materialsList.remove(material)
+                Sta.model = None
                 matList.delete(matList.selection())
                 entry_name.delete(0, tk.END)
                 entry_E.delete(0, tk.END)
@@ -556,6 +560,7 @@ def main():
 
             for section in Sta.sectionsList:
                 if section.name == name:
+                    Sta.model = None
                     if sectionType == 0:
                         section.generic(entries[0], entries[1],
                                         entries[2], entries[3])
@@ -606,6 +611,7 @@ def main():
                 section = next((section for section in Sta.sectionsList
                                 if section.name == name), None)
                 Sta.sectionsList.remove(section)
+                Sta.model = None
                 secList.delete(secList.selection())
 
                 for i in range(len(Sta.entriesList)):
@@ -1596,6 +1602,7 @@ def main():
                     return
                 else:
                     Sta.loadcasesList.append(name)
+                    Sta.model = None
                     caseList.insert('', 'end', name, text=name)
 
                     for node in Sta.nodesList:
@@ -1730,6 +1737,7 @@ def main():
                         if case == selected:
                             i = Sta.loadcasesList.index(case)
                             Sta.loadcasesList.remove(case)
+                            Sta.model = None
                             itemsList = caseList.get_children()
                             item = next((itemsList[i] for i in
                                          range(len(itemsList)) if
@@ -2109,7 +2117,10 @@ def main():
             entries = [fn.entryGet(entry_maxiter, 'int'),
                        fn.entryGet(entry_maxerror, 'float'),
                        fn.entryGet(entry_hx, 'float'),
-                       fn.entryGet(entry_hy, 'float')]
+                       fn.entryGet(entry_hy, 'float'),
+                       fn.entryGet(entry_workers, 'int'),
+                       fn.entryGet(entry_refresh, 'float'),
+                       fn.entryGet(entry_stations, 'int')]
 
             for entry in entries:
                 if entry == 'error' or entry < 0:
@@ -2117,9 +2128,16 @@ def main():
                     window_settings.lift()
                     return
             else:
+                if entries[4] < 1 or entries[6] < 1:
+                    messagebox.showwarning('error', 'Enter valid values.')
+                    window_settings.lift()
+                    return
+
                 for i in range(15):
                     Sta.units[i] = Sta.unitVars[i].get()
                 Sta.maxiter, Sta.maxerror = entries[0], entries[1]
+                Sta.workers, Sta.refresh = entries[4], entries[5]
+                Sta.stations = entries[6]
                 Sta.hx = fn.unitConvert(Sta.units[0], 'cm', entries[2])
                 Sta.hy = fn.unitConvert(Sta.units[0], 'cm', entries[3])
 
@@ -2201,6 +2219,31 @@ def main():
                                                             columnspan=3,
                                                             sticky=tk.W)
 
+        ttk.Checkbutton(frame_analysis, text='renumber DOFs (bandwidth)',
+                        variable=Sta.renumber).grid(row=11, column=1,
+                                                    columnspan=5, sticky=tk.W)
+
+        ttk.Label(frame_analysis,
+                  text='linear solver:').grid(row=13, column=1, sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='direct',
+                        variable=Sta.solverType, value=0).grid(row=13,
+                                                               column=3,
+                                                               columnspan=3,
+                                                               sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='PCG (Jacobi)',
+                        variable=Sta.solverType, value=1).grid(row=15,
+                                                               column=3,
+                                                               columnspan=3,
+                                                               sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='PCG (incomplete Cholesky)',
+                        variable=Sta.solverType, value=2).grid(row=17,
+                                                               column=3,
+                                                               columnspan=3,
+                                                               sticky=tk.W)
+
         entry_maxiter = ttk.Entry(frame_analysis, width=6, justify=tk.RIGHT)
         entry_maxerror = ttk.Entry(frame_analysis, width=6, justify=tk.RIGHT)
 
@@ -2209,6 +2252,70 @@ def main():
         entry_maxiter.grid(row=3, column=3, sticky=tk.W)
         entry_maxerror.grid(row=3, column=9, sticky=tk.W)
 
+        ttk.Label(frame_analysis,
+                  text='2nd order processes:').grid(row=19, column=1,
+                                                    sticky=tk.W)
+        entry_workers = ttk.Entry(frame_analysis, width=6, justify=tk.RIGHT)
+        entry_workers.insert(0, str(Sta.workers))
+        entry_workers.grid(row=19, column=3, sticky=tk.W)
+
+        ttk.Label(frame_analysis,
+                  text='2nd order acceleration:').grid(row=21, column=1,
+                                                       sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='none',
+                        variable=Sta.acceleration, value=0).grid(row=21,
+                                                                 column=3,
+                                                                 columnspan=3,
+                                                                 sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='Aitken',
+                        variable=Sta.acceleration, value=1).grid(row=23,
+                                                                 column=3,
+                                                                 columnspan=3,
+                                                                 sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='Anderson',
+                        variable=Sta.acceleration, value=2).grid(row=25,
+                                                                 column=3,
+                                                                 columnspan=3,
+                                                                 sticky=tk.W)
+
+        ttk.Label(frame_analysis,
+                  text='2nd order start:').grid(row=27, column=1, sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='zero axial forces',
+                        variable=Sta.warmStart, value=0).grid(row=27,
+                                                              column=3,
+                                                              columnspan=3,
+                                                              sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='linear solution',
+                        variable=Sta.warmStart, value=1).grid(row=29,
+                                                              column=3,
+                                                              columnspan=3,
+                                                              sticky=tk.W)
+
+        ttk.Radiobutton(frame_analysis, text='linear solution and loadcases',
+                        variable=Sta.warmStart, value=2).grid(row=31,
+                                                              column=3,
+                                                              columnspan=3,
+                                                              sticky=tk.W)
+
+        ttk.Label(frame_analysis,
+                  text='2nd order refresh:').grid(row=33, column=1,
+                                                  sticky=tk.W)
+        entry_refresh = ttk.Entry(frame_analysis, width=6, justify=tk.RIGHT)
+        entry_refresh.insert(0, str(Sta.refresh))
+        entry_refresh.grid(row=33, column=3, sticky=tk.W)
+
+        ttk.Label(frame_analysis,
+                  text='deflection steps:').grid(row=35, column=1,
+                                                 sticky=tk.W)
+        entry_stations = ttk.Entry(frame_analysis, width=6, justify=tk.RIGHT)
+        entry_stations.insert(0, str(Sta.stations))
+        entry_stations.grid(row=35, column=3, sticky=tk.W)
+
         unitNames = ['Length:', 'Force:', 'Moment:', 'Loading:',
                      'Temperature:', 'Elasticity:', 'Coef. thermal:',
                      'Height:', 'Área:', 'Inertia:', 'Displacement:',
@@ -2350,6 +2457,7 @@ def main():
             Sta.results = run.linear(Sta)
         elif Sta.analysisType.get() == 1:
             Sta.results = run.galambos(Sta)
+        Sta.statusbar.set(run.report(Sta))
 
         if True:
             cases = []
@@ -2364,11 +2472,14 @@ def main():
             if Sta.analysisType.get() == 0:
                 Sta.displacements = run.dispLinear(Sta)
                 Sta.forces = run.internalForces(Sta, 0)
+                Sta.extrema = run.extrema(Sta)
+                run.envelope(Sta)
                 run.maxmin(Sta)
 
             elif Sta.analysisType.get() == 1:
                 Sta.displacements = run.dispNonlinear(Sta)
                 Sta.forces = run.internalForces(Sta, 1)
+                run.envelope(Sta)
                 run.maxmin(Sta)
 
             mainX, mainY = window_main.winfo_x(), window_main.winfo_y()
@@ -2572,4 +2683,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # The frozen executable must run the worker processes, not the GUI
+    multiprocessing.freeze_support()
     main()
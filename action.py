@@ -218,6 +218,7 @@ def runActions(canvas):
     '''
     Runs every action in the action history.
     '''
+    canvas.model = None
     canvas.nodesList = []
     canvas.membersList = []
     for node in canvas.permanent[0]:
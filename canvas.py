@@ -88,11 +88,39 @@ class drawingCanvas():
         self.comboFactors = []
 
         self.results = []
+        self.baseResults = []   # Linear solutions per loadcase (superposition)
+        self.model = None       # Compiled analysis model, reset on any edit
+        self.factorization = []  # Last linear factorization, kept for edits
         self.displacements, self.forces = [], []
+        self.polynomials = []   # Exact member polynomials (linear analysis)
+        self.extrema = []       # Exact member maxima and minima (linear)
         self.max, self.min = [], []
+        self.envelope = []      # Envelopes of loadcases and combinations
+        self.maxStations, self.minStations = [], []
 
         self.analysisType = tk.IntVar(value=0)
         self.maxiter, self.maxerror = 20, 0.001
+        self.renumber = tk.IntVar(value=1)  # Bandwidth (RCM) DOF renumbering
+
+        # Linear solver: 0. Direct, 1. PCG (Jacobi), 2. PCG (Incomplete
+        # Cholesky); method, iterations and residuals of the last iterative
+        # solution (PCG or Galambos)
+        self.solverType = tk.IntVar(value=0)
+        self.convergence = []
+
+        # Processes sharing the nonlinear cases (1: no parallel analysis)
+        self.workers = 1
+        # Acceleration of the nonlinear iterations: 0. None, 1. Aitken,
+        # 2. Anderson
+        self.acceleration = tk.IntVar(value=2)
+        # Starting axial forces of the nonlinear iterations: 0. Zero,
+        # 1. Linear solution, 2. Linear solution and loadcases (combinations)
+        self.warmStart = tk.IntVar(value=2)
+        # Change of the axial forces, relative to the largest one, below
+        # which a member keeps its stiffness in the nonlinear iterations
+        # (0. Every changed member is refreshed)
+        self.refresh = 0.0
+        self.stations = 20  # Steps along each member of linear deflections
         self.resultClick = [-1, 0]   # Member number, clicked point/length
         self.showReactions = tk.IntVar(value=0)
 
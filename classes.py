@@ -6,6 +6,7 @@ except for the DrawingCanvas (which has its separate module).
 
 import numpy as np
 import functions as fn
+import solver
 import tkinter as tk
 
 
@@ -205,6 +206,323 @@ class Section():
         self.parameters = [bf1, tf1, bf2, tf2, d, t]
 
 
+class Properties():
+    '''
+    Member properties table used by the analysis. Each member gets integer
+    material and section ids, found once by name, and the properties are
+    stored as arrays indexed by member.
+    '''
+    def __init__(self, canvas):
+        materials, sections = {}, {}
+        for i in range(len(canvas.materialsList)):
+            materials.setdefault(canvas.materialsList[i].name, i)
+        for i in range(len(canvas.sectionsList)):
+            sections.setdefault(canvas.sectionsList[i].name, i)
+
+        # Material and section ids
+        self.material = np.array([materials[member.material] for member in
+                                  canvas.membersList], dtype=int)
+        self.section = np.array([sections[member.section] for member in
+                                 canvas.membersList], dtype=int)
+
+        def table(objects, attribute, ids):
+            values = [getattr(obj, attribute) for obj in objects]
+            return np.array(values, dtype=float).reshape(-1)[ids]
+
+        self.L = np.array([member.length for member in canvas.membersList],
+                          dtype=float)
+        self.E = table(canvas.materialsList, 'elasticity', self.material)
+        self.alpha = table(canvas.materialsList, 'thermal', self.material)
+        self.I = table(canvas.sectionsList, 'inertia', self.section)
+        self.A = table(canvas.sectionsList, 'area', self.section)
+        self.ysup = table(canvas.sectionsList, 'ysup', self.section)
+        self.yinf = table(canvas.sectionsList, 'yinf', self.section)
+
+
+class AnalysisModel():
+    '''
+    Compiled form of the structure used by the analysis: DOF numbering,
+    rotation matrices, member properties and loadcase loads, all stored as
+    arrays. It is built once and shared by the solvers and the
+    post-processing functions until the structure is edited. With renumber,
+    the free DOFs are numbered following the Reverse Cuthill-McKee order of
+    the nodes, which narrows the stiffness matrix band.
+    '''
+    def __init__(self, canvas, renumber=False):
+        self.renumber = renumber
+        self.nnodes = nnodes = len(canvas.nodesList)
+        self.nmembers = nmembers = len(canvas.membersList)
+        self.nbase = len(canvas.loadcasesList)
+
+        # Connectivity and constraints
+        self.nodes = np.array([member.nodes for member in canvas.membersList],
+                              dtype=int).reshape(nmembers, 2)
+        self.nlib = np.array([member.nlib for member in canvas.membersList],
+                             dtype=int).reshape(nmembers, 2)
+        self.theta = np.array([member.theta for member in canvas.membersList],
+                              dtype=float)
+        self.restr = np.array([node.restr for node in canvas.nodesList],
+                              dtype=float).reshape(nnodes, 4)
+
+        self.properties = Properties(canvas)
+        self.numbering(canvas)
+        self.rotations()
+        self.loads(canvas)
+
+    @staticmethod
+    def endOrder(ends, mask):
+        '''
+        Finds, for each masked member end, how many masked ends with the same
+        node come before it (in member order).
+        '''
+        r = np.zeros(len(ends), dtype=int)
+        keys = ends[mask]
+        order = np.argsort(keys, kind='stable')
+        ordered = keys[order]
+        first = np.searchsorted(ordered, ordered)
+        r[np.flatnonzero(mask)[order]] = np.arange(len(keys)) - first
+        return r
+
+    @staticmethod
+    def rotationMatrices(theta1, theta2):
+        '''
+        Creates the (nmembers, 6, 6) rotation matrices which turn each member
+        end's x/y components by theta1 (start) and theta2 (end).
+        '''
+        theta1, theta2 = np.asarray(theta1, float), np.asarray(theta2, float)
+        R = np.zeros(theta1.shape + (6, 6))
+        for i, theta in [[0, theta1], [3, theta2]]:
+            cos, sin = np.cos(theta), np.sin(theta)
+            R[:, i, i], R[:, i, i+1] = cos, sin
+            R[:, i+1, i], R[:, i+1, i+1] = -sin, cos
+            R[:, i+2, i+2] = 1
+        return R
+
+    def numbering(self, canvas):
+        '''
+        Numbers the structure's degrees of freedom. Each node has 3 DOF
+        indices plus one extra rotation for every member end released by
+        a nodal or internal hinge, and restrained indices get DOF = -1.
+        index holds the first DOF index of each node and DOFextras the
+        number of extra rotations of nodes with all ends released.
+        '''
+        nnodes, nmembers = self.nnodes, self.nmembers
+        nodes, nlib, restr = self.nodes, self.nlib, self.restr
+
+        hinge = np.array([node.hinge for node in canvas.nodesList], dtype=int)
+        springs = np.array([node.springs for node in canvas.nodesList],
+                           dtype=float).reshape(nnodes, 3)
+        pdispl = np.array([node.pdispl for node in canvas.nodesList],
+                          dtype=float).reshape(nnodes, 3)
+
+        # Number of elements per node
+        nelem = np.bincount(nodes.ravel(), minlength=nnodes)
+
+        # Nodal hinges
+        DOFextras = np.where((hinge == 1) & (nelem > 0), nelem - 1, 0)
+
+        # Internal hinges
+        released = (nlib == 1) & (hinge[nodes] == 0) & (nelem[nodes] > 1)
+        DOFint = np.bincount(nodes[released], minlength=nnodes)
+
+        full = (DOFint == nelem) & (nelem > 0)
+        DOFextras[full] = nelem[full] - 1
+        DOFint[full] = 0
+
+        # First DOF index of each node
+        count = 3 + DOFextras + DOFint
+        index = np.cumsum(count) - count
+
+        # Owner node and component (0. dx, 1. dy, 2+. rz) of every DOF index
+        owner = np.repeat(np.arange(nnodes), count)
+        comp = np.arange(count.sum()) - index[owner]
+        rz = np.minimum(comp, 2)
+
+        # DOF vector creation (shared rotations are restrained only if unique)
+        single = (DOFextras == 0) & (DOFint == 0)
+        fixed = (restr[owner, rz] > 0) & ((comp < 2) | single[owner])
+        ndof = int(np.count_nonzero(~fixed))
+        DOF = np.full(len(owner), -1)
+        DOF[~fixed] = np.arange(ndof)
+
+        # Member DOF lists: each released end gets its own rotation index
+        ends = nodes.ravel()
+        a = index[ends]
+        internal = (nlib.ravel() != 0) & (DOFint[ends] != 0)
+        b = np.where(DOFextras[ends] != 0,
+                     a + self.endOrder(ends, np.ones(len(ends), dtype=bool)),
+                     np.where(internal, a + self.endOrder(ends, internal) + 1,
+                              a))
+        a, b = a.reshape(nmembers, 2), b.reshape(nmembers, 2)
+
+        MDOFIndex = np.stack([a[:, 0], a[:, 0]+1, b[:, 0]+2,
+                              a[:, 1], a[:, 1]+1, b[:, 1]+2], axis=1)
+
+        # Bandwidth renumbering: only the free DOF numbers change, so the
+        # results (stored by DOF index) come out in the original order
+        self.bandwidth = [solver.bandwidth(DOF[MDOFIndex])]*2
+        if self.renumber and nmembers > 0:
+            rank = np.empty(nnodes, dtype=int)
+            rank[solver.rcm(nnodes, nodes)] = np.arange(nnodes)
+            free = np.flatnonzero(~fixed)
+            free = free[np.argsort(rank[owner[free]], kind='stable')]
+            DOF[free] = np.arange(ndof)
+            self.bandwidth[1] = solver.bandwidth(DOF[MDOFIndex])
+
+        self.DOF, self.ndof, self.index = DOF, ndof, index
+        self.DOFextras, self.owner, self.comp = DOFextras, owner, comp
+        self.MDOFIndex, self.MemberDOF = MDOFIndex, DOF[MDOFIndex]
+
+        # Springs and prescribed displacements, by DOF index
+        self.springs, self.pdispl = springs[owner, rz], pdispl[owner, rz]
+
+    def rotations(self):
+        '''
+        Creates the member rotation matrices, the oblique support rotation
+        matrices and their products T = Rot.RI, as (nmembers, 6, 6) arrays.
+        '''
+        nodes, restr = self.nodes, self.restr
+
+        # Oblique supports: a single restrained translation, at an angle
+        oblique = np.where(restr[:, 0]+restr[:, 1] == 1, -restr[:, 3], 0)
+
+        self.RotList = self.rotationMatrices(self.theta, self.theta)
+        self.RIList = self.rotationMatrices(oblique[nodes[:, 0]],
+                                            oblique[nodes[:, 1]])
+        self.T = np.matmul(self.RotList, self.RIList)
+
+        # Members with an end on an inclined support (RI is not identity)
+        self.inclined = np.any(oblique[nodes] != 0, axis=1)
+
+        # Prescribed displacements at the member ends
+        self.mpdispl = np.einsum('mij,mj->mi', self.RIList,
+                                 self.pdispl[self.MDOFIndex])
+
+    def loads(self, canvas):
+        '''
+        Gathers the loads of every loadcase: nodal forces in global
+        coordinates, member loads in member-local coordinates, temperatures
+        and the initial imperfection vectors.
+        '''
+        nnodes, nmembers, nbase = self.nnodes, self.nmembers, self.nbase
+
+        def table(objects, attribute, n):
+            values = [getattr(obj, attribute) for obj in objects]
+            return np.array(values, dtype=float).reshape(n, nbase)
+
+        # Nodal forces, converted into global coordinates
+        Px = table(canvas.nodesList, 'Px', nnodes)
+        Py = table(canvas.nodesList, 'Py', nnodes)
+        angle = table(canvas.nodesList, 'Pangle', nnodes)
+        cos, sin = np.cos(angle), np.sin(angle)
+        self.PX = Px*cos + Py*(-sin)
+        self.PY = Px*sin + Py*cos
+        self.MZ = table(canvas.nodesList, 'Mz', nnodes)
+
+        # Member loads, converted into member-local coordinates
+        qx = table(canvas.membersList, 'qx', nmembers)
+        qy = table(canvas.membersList, 'qy', nmembers)
+        qtype = table(canvas.membersList, 'qtype', nmembers)
+        cos, sin = np.cos(self.theta)[:, None], np.sin(self.theta)[:, None]
+        self.QX = np.where(qtype == 0, qx*cos + qy*sin, qx)
+        self.QY = np.where(qtype == 0, qx*(-sin) + qy*cos, qy)
+
+        self.Tsup = table(canvas.membersList, 'Tsup', nmembers)
+        self.Tinf = table(canvas.membersList, 'Tinf', nmembers)
+
+        # Initial imperfection vectors
+        p = self.properties
+        e = np.array([member.tensile for member in canvas.membersList], float)
+        f = np.array([member.curvature for member in canvas.membersList],
+                     float)
+        self.Fimp = np.zeros((nmembers, 6))
+        self.Fimp[:, 0] = e*p.E*p.A/p.L
+        self.Fimp[:, 2] = 8*p.E*p.I*f/p.L**2
+        self.Fimp[:, 3], self.Fimp[:, 5] = -self.Fimp[:, 0], -self.Fimp[:, 2]
+
+    def nodalForces(self, factors):
+        '''
+        Creates the nodal forces in global coordinates, for each row of load
+        factors: returns the (ncases, nindex) forces by DOF index, supported
+        ones included, and the (ncases, ndof) forces vectors arranged by DOF.
+        '''
+        DOF, owner, comp = self.DOF, self.owner, self.comp
+        PX, PY = np.dot(self.PX, factors.T), np.dot(self.PY, factors.T)
+        MZ = np.dot(self.MZ, factors.T)
+
+        # Nodal moments go to the node's rotation, or to every member end
+        # rotation when all of them are released
+        moment = (comp == 2) | ((comp > 2) & (self.DOFextras[owner] > 0))
+
+        FI = np.zeros((len(factors), len(DOF)))
+        for rows, values in [[comp == 0, PX], [comp == 1, PY], [moment, MZ]]:
+            FI[:, rows] = values[owner[rows]].T
+
+        FN = np.zeros((len(factors), self.ndof))
+        FN[:, DOF[DOF >= 0]] = FI[:, DOF >= 0]
+
+        return [FI, FN]
+
+    def memberLoads(self, factors):
+        '''
+        Creates the (ncases, nmembers, 6) member-local load vectors of the
+        distributed and thermal loads, for each row of load factors.
+        '''
+        p = self.properties
+        L, E, A, I, alpha = p.L, p.E, p.A, p.I, p.alpha
+
+        qx, qy = np.dot(factors, self.QX.T), np.dot(factors, self.QY.T)
+        Tsup = np.dot(factors, self.Tsup.T)
+        Tinf = np.dot(factors, self.Tinf.T)
+
+        h = p.ysup + p.yinf
+        T0 = (Tsup*p.ysup + Tinf*p.yinf)/h
+        dT = Tsup - Tinf
+
+        F0L = np.zeros(qx.shape + (6,))
+        F0L[..., 0] = qx*L/2 - alpha*E*A*T0
+        F0L[..., 1] = F0L[..., 4] = qy*L/2
+        F0L[..., 2] = qy*L*L/12 + alpha*E*I*dT/h
+        F0L[..., 3] = qx*L/2 + alpha*E*A*T0
+        F0L[..., 5] = -qy*L*L/12 - alpha*E*I*dT/h
+        return F0L
+
+
+class MemberResults():
+    '''
+    Results of linear analysis at nstations equal steps along every member,
+    read as [case][member] like the lists of nonlinear analysis. They are
+    evaluated from the exact member polynomials (ncases, nmembers, 6, k)
+    when read, so only the coefficients are stored. Each member gives the
+    values of the chosen quantities (indices of u, v, r, N, V and M; those
+    in ends only at the member ends), then the stations X.
+    '''
+    def __init__(self, polynomials, L, nstations, quantities, ends=()):
+        self.polynomials, self.L, self.nstations = polynomials, L, nstations
+        self.quantities, self.ends = quantities, ends
+
+    def __len__(self):
+        return len(self.polynomials)
+
+    def __getitem__(self, i):
+        if self.polynomials.ndim == 4:
+            return MemberResults(self.polynomials[i], self.L, self.nstations,
+                                 self.quantities, self.ends)
+
+        X = self.L[i]*np.linspace(0, 1, self.nstations)
+        values = []
+        for q in self.quantities:
+            x = X[[0, -1]] if q in self.ends else X
+            values.append(fn.polynomial(self.polynomials[i, q], x))
+        return values + [X]
+
+    def stations(self):
+        '''
+        Returns the stations of every member, (nmembers, nstations).
+        '''
+        return self.L[:, None]*np.linspace(0, 1, self.nstations)
+
+
 class CreateToolTip(object):
     '''
     create a tooltip for a given widget
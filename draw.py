@@ -1026,8 +1026,13 @@ def drawBendingMoment(canvas, member):
 
     canvas.canvas.create_line(curve, fill='green')
 
-    imax = np.argmax(M)
-    xmax, Mmax = X[imax], M[imax]
+    # Exact peak for linear analysis, the largest station value otherwise
+    if len(canvas.extrema) > 0:
+        xmax = canvas.extrema[0][case][member][2]
+        Mmax = canvas.extrema[1][case][member][2]
+    else:
+        imax = np.argmax(M)
+        xmax, Mmax = X[imax], M[imax]
     Mmaxt = fn.unitConvert('kN.cm', canvas.units[2], Mmax)
 
     px = fn.rotate([p1[0]+xmax*canvas.scale, p1[1]], p1, theta)
@@ -1117,15 +1122,22 @@ def drawClickResult(canvas):
     else:
         lower = closest-1
 
+    # Linear analysis: exact values from the member polynomials
+    exact = len(canvas.polynomials) > 0
+    if exact:
+        u, v, r, Nx, Vx, Mx = fn.polynomial(canvas.polynomials[case][member],
+                                            xL)
+
     if rType == 'displace':
         f = canvas.resultsScale[0]
         U = canvas.displacements[case][member][0]
         V = canvas.displacements[case][member][1]
         R = canvas.displacements[case][member][2]
 
-        u = fn.linInterp(X[lower], U[lower], X[lower+1], U[lower+1], xL)
-        v = fn.linInterp(X[lower], V[lower], X[lower+1], V[lower+1], xL)
-        r = fn.linInterp(X[lower], R[lower], X[lower+1], R[lower+1], xL)
+        if not exact:
+            u = fn.linInterp(X[lower], U[lower], X[lower+1], U[lower+1], xL)
+            v = fn.linInterp(X[lower], V[lower], X[lower+1], V[lower+1], xL)
+            r = fn.linInterp(X[lower], R[lower], X[lower+1], R[lower+1], xL)
 
         px = fn.rotate([p1[0]+xL*canvas.scale, p1[1]], p1, theta)
         pd = fn.rotate([p1[0]+xL*canvas.scale+f*canvas.scale*u,
@@ -1153,7 +1165,8 @@ def drawClickResult(canvas):
         f = canvas.resultsScale[3]
         M = canvas.forces[case][member][2]
 
-        Mx = fn.linInterp(X[lower], M[lower], X[lower+1], M[lower+1], xL)
+        if not exact:
+            Mx = fn.linInterp(X[lower], M[lower], X[lower+1], M[lower+1], xL)
         Mxt = fn.unitConvert('kN.cm', canvas.units[2], Mx)
 
         px = fn.rotate([p1[0]+xL*canvas.scale, p1[1]], p1, theta)
@@ -1170,9 +1183,9 @@ def drawClickResult(canvas):
         f = canvas.resultsScale[2]
         V = canvas.forces[case][member][1]
 
-        if len(V) <= 2:
+        if not exact and len(V) <= 2:
             Vx = V[0] + (xL/L)*(V[1]-V[0])
-        else:
+        elif not exact:
             Vx = fn.linInterp(X[lower], V[lower], X[lower+1], V[lower+1], xL)
 
         Vxt = fn.unitConvert('kN', canvas.units[1], Vx)
@@ -1190,7 +1203,8 @@ def drawClickResult(canvas):
         f = canvas.resultsScale[1]
         N = canvas.forces[case][member][0]
 
-        Nx = N[0] + (xL/L)*(N[1]-N[0])
+        if not exact:
+            Nx = N[0] + (xL/L)*(N[1]-N[0])
         Nxt = fn.unitConvert('kN', canvas.units[1], Nx)
 
         px = fn.rotate([p1[0]+xL*canvas.scale, p1[1]], p1, theta)
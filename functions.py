@@ -19,6 +19,58 @@ def linInterp(x1, y1, x2, y2, x):
     return y
 
 
+def polynomial(c, x):
+    '''
+    Evaluates polynomials at x, given their coefficients in ascending
+    powers along the last axis of c (x is broadcast against the others).
+    '''
+    c = np.asarray(c)
+    y = np.zeros(np.broadcast(c[..., 0], x).shape)
+    for a in np.moveaxis(c, -1, 0)[::-1]:
+        y *= x
+        y += a
+    return y
+
+
+def polynomialRoots(c, tol=1e-9):
+    '''
+    Finds the real roots of polynomials, given their coefficients in
+    ascending powers along the last axis of c. Coefficients below tol
+    times the largest one are neglected; the missing and complex roots are
+    returned as nan.
+    '''
+    c = np.asarray(c, dtype=float)
+    n = c.shape[-1] - 1
+    roots = np.full(c.shape[:-1] + (n,), np.nan)
+
+    big = np.absolute(c) > tol*np.amax(np.absolute(c), axis=-1, keepdims=True)
+    degree = np.where(big.any(axis=-1), n - np.argmax(big[..., ::-1], -1), 0)
+
+    for d in range(1, n+1):
+        m = degree == d
+        a = c[m][:, :d+1]
+        if d == 1:
+            roots[m, 0] = -a[:, 0]/a[:, 1]
+            continue
+        if d == 2:
+            disc = a[:, 1]**2 - 4*a[:, 0]*a[:, 2]
+            q = -(a[:, 1] + np.copysign(np.sqrt(np.maximum(disc, 0)),
+                                        a[:, 1]))/2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = np.stack([q/a[:, 2], a[:, 0]/q], axis=-1)
+            roots[m, :2] = np.where(disc[:, None] >= 0, z, np.nan)
+            continue
+
+        # Eigenvalues of the companion matrices
+        companion = np.zeros((len(a), d, d))
+        companion[:, np.arange(1, d), np.arange(d-1)] = 1
+        companion[:, :, -1] = -a[:, :d]/a[:, d, None]
+        z = np.linalg.eigvals(companion)
+        roots[m, :d] = np.where(np.absolute(z.imag) <= tol*np.absolute(z),
+                                z.real, np.nan)
+    return roots
+
+
 def distance(p1, p2):
     '''
     Returns the euclidean distance between two vectors.
@@ -89,6 +89,7 @@ def load(canvas, filepath):
     canvas.comboFactors = []
     canvas.permanent = [[], []]
     canvas.results, canvas.resultClick = [], [-1, 0]
+    canvas.baseResults, canvas.model, canvas.factorization = [], None, []
     canvas.actions, canvas.undone = [], []
     canvas.canvas.yview_moveto(0.475)
     canvas.canvas.xview_moveto(0.495)
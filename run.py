@@ -2,7 +2,11 @@
 RUN MODULE - Contains the core functions, responsible for the analysis itself.
 '''
 
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import functions as fn
+import solver
+from classes import AnalysisModel, MemberResults
 
 
 def comboFactors(Sta, case):
@@ -19,883 +23,735 @@ def comboFactors(Sta, case):
     return r
 
 
-def linear(Sta):
+def factorMatrix(Sta):
     '''
-    Solves the structure using the default Stiffness Method.
+    Creates the (ncases, nloadcases) array with the factors of every
+    loadcase and combination, one row per case.
     '''
-    # ---------------------- INITIAL PARAMETERS -------------------------
+    ncases = len(Sta.loadcasesList)+len(Sta.COMBINATIONSList)
+    r = np.zeros((ncases, len(Sta.loadcasesList)))
+    for n in range(ncases):
+        r[n] = comboFactors(Sta, n)
+    return r
+
+
+def baseFactors(Sta):
+    '''
+    Creates the loadcase factors of the linear base solutions: a unit row
+    for each loadcase, plus a row of zeros for the load-independent one.
+    '''
+    nbase = len(Sta.loadcasesList)
+    return np.vstack([np.eye(nbase), np.zeros(nbase)])
+
 
-    # Numbers of nodes, members and loadcases/COMBINATIONS
-    nnodes, nmembers = len(Sta.nodesList), len(Sta.membersList)
+def superposition(Sta):
+    '''
+    Creates the array which builds every loadcase and combination from the
+    linear base solutions: one column per loadcase, plus a last column for
+    the load-independent effects (prescribed displacements and initial
+    imperfections), which always enter with a unit factor.
+    '''
     ncases = len(Sta.loadcasesList)+len(Sta.COMBINATIONSList)
+    return np.hstack([factorMatrix(Sta), np.ones((ncases, 1))])
 
-    # Number of elements per node:
-    nelem = np.zeros(nnodes)
-    for member in Sta.membersList:
-        n1, n2 = member.nodes[0], member.nodes[1]
-        nelem[n1] += 1
-        nelem[n2] += 1
-
-    # Nodal hinges
-    DOFextras, mdone = np.zeros(nnodes), np.zeros(nnodes)
-    for i in range(nnodes):
-        if Sta.nodesList[i].hinge == 1 and nelem[i] > 0:
-            DOFextras[i] = nelem[i] - 1
-
-    # Internal hinges
-    DOFint, mintdone = np.zeros(nnodes), np.zeros(nnodes)
-    for member in Sta.membersList:
-        n1, n2 = member.nodes[0], member.nodes[1]
-        if (member.nlib[0] == 1 and
-                Sta.nodesList[n1].hinge == 0 and nelem[n1] > 1):
-            DOFint[n1] += 1
-        if (member.nlib[1] == 1 and
-                Sta.nodesList[n2].hinge == 0 and nelem[n2] > 1):
-            DOFint[n2] += 1
-
-    for i in range(nnodes):
-        if DOFint[i] == nelem[i] and nelem[i] > 0:
-            DOFextras[i] = nelem[i] - 1
-            DOFint[i] = 0
-
-    # Springs and prescribed displacement vectors
-    springs, pdispl = [], []
-    for node in Sta.nodesList:
-        i = Sta.nodesList.index(node)
-        springs.append(node.springs[0])
-        springs.append(node.springs[1])
-        springs.append(node.springs[2])
-
-        pdispl.append(node.pdispl[0])
-        pdispl.append(node.pdispl[1])
-        pdispl.append(node.pdispl[2])
-
-        for j in range(int(DOFextras[i])):
-            springs.append(node.springs[2])
-            pdispl.append(node.pdispl[2])
-
-        for j in range(int(DOFint[i])):
-            springs.append(node.springs[2])
-            pdispl.append(node.pdispl[2])
-
-    # DOF vector creation
-    DOF, ndof = [], 0
-    for node in Sta.nodesList:
-        i = Sta.nodesList.index(node)
-        if node.restr[0] > 0:
-            DOF.append(-1)
-        else:
-            DOF.append(ndof)
-            ndof += 1
 
-        if node.restr[1] > 0:
-            DOF.append(-1)
-        else:
-            DOF.append(ndof)
-            ndof += 1
+def superpose(Sta, base):
+    '''
+    Builds the results of every loadcase and combination by combining the
+    base results (first axis: loadcases + load-independent column).
+    '''
+    return np.tensordot(superposition(Sta), np.asarray(base), axes=1)
 
-        if (node.restr[2] > 0 and DOFextras[i] == 0
-                and DOFint[i] == 0):
-            DOF.append(-1)
-        else:
-            if DOFextras[i] != 0:
-                for j in range(int(DOFextras[i])+1):
-                    DOF.append(ndof)
-                    ndof += 1
-            elif DOFint[i] != 0:
-                for j in range(int(DOFint[i])+1):
-                    DOF.append(ndof)
-                    ndof += 1
-            else:
-                DOF.append(ndof)
-                ndof += 1
-
-    # Member DOF lists
-    MemberDOF = []
-    MDOFIndex = []
-    for member in Sta.membersList:
-        n1, n2 = member.nodes[0], member.nodes[1]
-        a1 = int(DOFextras[0:n1].sum(axis=0)+DOFint[0:n1].sum(axis=0)+3*n1)
-        a2 = int(DOFextras[0:n2].sum(axis=0)+DOFint[0:n2].sum(axis=0)+3*n2)
-
-        if DOFextras[n1] != 0:
-            b1 = a1 + int(mdone[n1])
-        elif DOFint[n1] != 0 and member.nlib[0] != 0:
-            mintdone[n1] += 1
-            b1 = a1 + int(mintdone[n1])
-        else:
-            b1 = a1
 
-        if DOFextras[n2] != 0:
-            b2 = a2 + int(mdone[n2])
-        elif DOFint[n2] != 0 and member.nlib[1] != 0:
-            mintdone[n2] += 1
-            b2 = a2 + int(mintdone[n2])
-        else:
-            b2 = a2
+def compileModel(Sta):
+    '''
+    Returns the compiled analysis model of the structure, building it
+    again only if the structure was edited since the last run.
+    '''
+    renumber = bool(Sta.renumber.get())
+    if Sta.model is None or Sta.model.renumber != renumber:
+        Sta.model = AnalysisModel(Sta, renumber)
+    return Sta.model
 
-        mindex = [a1, a1+1, b1+2, a2, a2+1, b2+2]
-        mdof = [DOF[index] for index in mindex]
 
-        if DOFextras[n1] > mdone[n1]:
-            mdone[n1] += 1
-        if DOFextras[n2] > mdone[n2]:
-            mdone[n2] += 1
+def report(Sta):
+    '''
+    Summarizes the last run (size and bandwidth of the stiffness matrix,
+    and the convergence of the PCG solver or of the Galambos iterations,
+    naming the cases that did not converge), to be shown in the status
+    bar.
+    '''
+    model = Sta.model
+    text = 'DOFs: {}   bandwidth: {}'.format(model.ndof, model.bandwidth[0])
+    if model.renumber:
+        text += ' (renumbered: {})'.format(model.bandwidth[1])
+
+    if len(Sta.convergence) > 0:
+        method, iterations, residuals = Sta.convergence
+        text += '   {}: {} iterations, residual {:.1e}'.format(
+            method, np.max(iterations), np.max(residuals))
+        if method == 'Galambos':
+            names = Sta.loadcasesList + Sta.COMBINATIONSList
+            failed = [names[n] for n in np.flatnonzero(
+                residuals >= Sta.maxerror)]
+            if len(failed) > 0:
+                text += '   not converged: ' + ', '.join(failed)
+    return text
+
+
+def memberForces(model, F0L):
+    '''
+    Transforms the member-local load vectors, shaped (ncases, nmembers, 6),
+    into global forces vectors shaped (ncases, ndof).
+    '''
+    F0G = transform(model.T, F0L, model.inclined, transpose=True)
+    return solver.scatter(model.MemberDOF, F0G, model.ndof)
 
-        MDOFIndex.append(mindex)
-        MemberDOF.append(mdof)
 
-    # ---------------------- NODAL FORCES VECTORS ------------------------
+def stabilityFunctions(P, L, E, I):
+    '''
+    Computes the stability functions C and S of every member for the axial
+    forces P (tension positive). Near zero the closed forms lose their
+    accuracy by cancellation, and the series in q = -P*L**2/(E*I) are used
+    instead; members without bending stiffness keep the linear C=4, S=2.
+    '''
+    EI = np.where(E*I < 1e-6, 1.0, E*I)
+    q = np.where(E*I < 1e-6, 0.0, -P*L**2/EI)
+    bL = np.sqrt(np.absolute(q))
 
-    # Converting nodal forces into global coordinates
-    PX = [np.zeros(len(Sta.loadcasesList)) for i in range(nnodes)]
-    PY = [np.zeros(len(Sta.loadcasesList)) for i in range(nnodes)]
-    MZ = [np.asarray(Sta.nodesList[i].Mz) for i in range(nnodes)]
+    with np.errstate(all='ignore'):
+        c = np.where(q > 0, (1-bL/np.tan(bL))/q,
+                     (bL/np.tanh(bL)-1)/-q)
+        s = np.where(q > 0, (bL/np.sin(bL)-1)/q,
+                     (1-bL/np.sinh(bL))/-q)
 
-    for node in Sta.nodesList:
-        n = Sta.nodesList.index(node)
+    # Series expansions (|q| < 0.01)
+    small = np.absolute(q) < 0.01
+    c[small] = np.polyval([2/93555, 1/4725, 2/945, 1/45, 1/3], q[small])
+    s[small] = np.polyval([73/3421440, 127/604800, 31/15120, 7/360, 1/6],
+                          q[small])
 
-        for i in range(len(Sta.loadcasesList)):
-            cos, sin = np.cos(node.Pangle[i]), np.sin(node.Pangle[i])
-            PX[n][i] = node.Px[i]*cos + node.Py[i]*(-sin)
-            PY[n][i] = node.Px[i]*sin + node.Py[i]*cos
+    return [c/(c*c-s*s), s/(c*c-s*s)]
 
-    # Nodal forces vectors
-    forces = [np.zeros(3*nnodes) for i in range(ncases)]
-    FN = [np.zeros(ndof) for i in range(ncases)]
-    for n in range(ncases):
-        cfactors = comboFactors(Sta, n)  # Combination factors for a given case
-
-        for i in range(nnodes):
-            # Find the current node's forces for the current case/combination
-            Px = np.dot(cfactors, PX[i])
-            Py = np.dot(cfactors, PY[i])
-            Mz = np.dot(cfactors, MZ[i])
-
-            # Full forces vector (no DOF checking)
-            forces[n][3*i] = Px
-            forces[n][3*i+1] = Py
-            forces[n][3*i+2] = Mz
-
-            # Check whether the DOF's are valid, and if so add the nodal forces
-            a = int(DOFextras[0:i].sum(axis=0)+DOFint[0:i].sum(axis=0)+3*i)
-            if DOF[a] >= 0:
-                FN[n][DOF[a]] += Px
-            if DOF[a+1] >= 0:
-                FN[n][DOF[a+1]] += Py
-
-            for j in range(int(DOFextras[i])+1):
-                if DOF[a+2+j] >= 0:
-                    FN[n][DOF[a+2+j]] += Mz
-
-            for j in range(int(DOFint[i])):
-                if DOF[a+2+j] >= 0:
-                    FN[n][DOF[a+2+j]] += Mz
-
-    # ----------------------- ROTATION MATRICES --------------------------
-
-    # Member rotation matrices
-    RotList = []
-    for member in Sta.membersList:
-        cos, sin = np.cos(member.theta), np.sin(member.theta)
-        R = np.array([[cos, sin, 0,   0,   0,  0],
-                      [-sin, cos, 0,   0,   0,  0],
-                      [0,   0,  1,   0,   0,  0],
-                      [0,   0,  0,  cos, sin, 0],
-                      [0,   0,  0, -sin, cos, 0],
-                      [0,   0,  0,   0,   0,  1]])
-        RotList.append(R)
-
-    # Oblique support rotation matrices
-    RIList = []
-    for member in Sta.membersList:
-        start = Sta.nodesList[member.nodes[0]]
-        end = Sta.nodesList[member.nodes[1]]
-
-        if start.restr[0]+start.restr[1] == 1:
-            theta1 = -start.restr[3]
-        else:
-            theta1 = 0
 
-        if end.restr[0]+end.restr[1] == 1:
-            theta2 = -end.restr[3]
-        else:
-            theta2 = 0
+def reactions(FG, FI, supported, MDOFIndex, owner, comp, restr):
+    '''
+    Support reactions R = Ksf.uf + Kss.us - F at the supported DOF indices
+    (mask), from the global member end forces FG = K.u - F0, shaped
+    (..., nmembers, 6), and the nodal forces FI by DOF index. Returns them
+    by node, shaped (..., nnodes, 3), turned from the support axes.
+    '''
+    nindex, nnodes = len(owner), len(restr)
+    R = (solver.scatter(MDOFIndex, FG, nindex) - FI) * supported
+    R = R.reshape(-1, nindex)
 
-        cos1, sin1 = np.cos(theta1), np.sin(theta1)
-        cos2, sin2 = np.cos(theta2), np.sin(theta2)
+    FR = np.zeros((len(R), nnodes*3))
+    np.add.at(FR, (slice(None), 3*owner + np.minimum(comp, 2)), R)
+    FR = FR.reshape(FG.shape[:-2] + (nnodes, 3))
 
-        RI = np.array([[cos1, sin1, 0,   0,    0,   0],
-                       [-sin1, cos1, 0,   0,    0,   0],
-                       [0,    0,   1,   0,    0,   0],
-                       [0,    0,   0,  cos2, sin2, 0],
-                       [0,    0,   0, -sin2, cos2, 0],
-                       [0,    0,   0,   0,    0,   1]])
-        RIList.append(RI)
+    cos, sin = np.cos(-restr[:, 3]), np.sin(-restr[:, 3])
+    FR[..., 0], FR[..., 1] = (FR[..., 0]*cos + FR[..., 1]*(-sin),
+                              FR[..., 0]*sin + FR[..., 1]*cos)
+    return FR
 
-    # ------------------------------- STIFFNESS MATRICES ----------------------
 
-    SList = []                            # Stiffness matrices list
-    FPdispl = np.zeros(ndof)            # Prescribed displacement forces list
-    SDOF = np.zeros((ndof, ndof))        # Global stiffness matrix
+def localStiffness(L, E, A, I, C=4, S=2, P=0):
+    '''
+    Creates the (nmembers, 6, 6) local member stiffness matrices. C and S
+    are the stability functions and P the axial forces (Galambos'
+    method); the defaults give the linear matrices.
+    '''
+    a = [E*A/L, 2*E*I*(C+S)/L**3+P/L, E*I*(C+S)/L**2, C*E*I/L, S*E*I/L]
+    a = np.broadcast_arrays(*a)
 
-    for m in range(nmembers):
-        L = Sta.membersList[m].length
+    SL = np.zeros(a[0].shape + (6, 6))
+    SL[:, 0, 0], SL[:, 0, 3], SL[:, 3, 0], SL[:, 3, 3] = (a[0], -a[0],
+                                                          -a[0], a[0])
+    for i, j, k, sign in [[1, 1, 1, 1], [1, 2, 2, 1], [1, 4, 1, -1],
+                          [1, 5, 2, 1], [2, 2, 3, 1], [2, 4, 2, -1],
+                          [2, 5, 4, 1], [4, 4, 1, 1], [4, 5, 2, -1],
+                          [5, 5, 3, 1]]:
+        SL[:, i, j] = SL[:, j, i] = sign*a[k]
+    return SL
 
-        material = next((material for material in Sta.materialsList if
-                         material.name == Sta.membersList[m].material), None)
-        section = next((section for section in Sta.sectionsList if
-                        section.name == Sta.membersList[m].section), None)
 
-        E, I, A = material.elasticity, section.inertia, section.area
+# Global member stiffness matrix of a member without inclined supports,
+# as indices of [g11, g12, g22, h1, h2, a3, a4] (plus 7 if negated)
+STIFFNESS_PATTERN = np.array([[0, 1, 3, 7, 8, 3], [1, 2, 4, 8, 9, 4],
+                              [3, 4, 5, 10, 11, 6], [7, 8, 10, 0, 1, 10],
+                              [8, 9, 11, 1, 2, 11], [3, 4, 6, 10, 11, 5]])
 
-        # Local member stiffness matrix
-        a = [E*A/L, 12*E*I/L**3, 6*E*I/L**2, 4*E*I/L, 2*E*I/L]
 
-        SL = np.array([[a[0],  0,     0,   -a[0],  0,     0],
-                       [0,   a[1],  a[2],   0,  -a[1],  a[2]],
-                       [0,   a[2],  a[3],   0,  -a[2],  a[4]],
-                       [-a[0],  0,     0,    a[0],  0,     0],
-                       [0,  -a[1], -a[2],   0,   a[1], -a[2]],
-                       [0,   a[2],  a[4],   0,  -a[2],  a[3]]])
+def globalStiffness(SL, T, inclined=None):
+    '''
+    Transforms the local member stiffness matrices, as built by
+    localStiffness, into global coordinates for the (nmembers, 6, 6)
+    transformations T = Rot.RI. Members without inclined supports (T = Rot)
+    are written in closed form, in terms of the cosine and sine of the
+    member; the products are only done for the inclined ones.
+    '''
+    if inclined is None:
+        inclined = np.ones(len(SL), dtype=bool)
 
-        # Global member stiffness matrix
-        SG = np.dot(RIList[m].T, np.dot(RotList[m].T, SL))
-        SG = np.dot(SG, np.dot(RotList[m], RIList[m]))
-        SList.append(SG)
+    cos, sin = T[:, 0, 0], T[:, 0, 1]
+    a0, a1, a2 = SL[:, 0, 0], SL[:, 1, 1], SL[:, 1, 2]
+    g = [a0*cos*cos + a1*sin*sin, (a0-a1)*cos*sin, a0*sin*sin + a1*cos*cos,
+         -a2*sin, a2*cos, SL[:, 2, 2], SL[:, 2, 5]]
+    SG = np.stack(g + [-v for v in g], axis=1)[:, STIFFNESS_PATTERN]
 
-        # Prescribed displacements vector
-        mdx = MDOFIndex[m]
-        mpdispl = np.array([pdispl[mdx[0]], pdispl[mdx[1]], pdispl[mdx[2]],
-                            pdispl[mdx[3]], pdispl[mdx[4]], pdispl[mdx[5]]])
+    if np.any(inclined):
+        Ti = T[inclined]
+        SG[inclined] = np.matmul(np.transpose(Ti, (0, 2, 1)),
+                                 np.matmul(SL[inclined], Ti))
+    return SG
 
-        mpdispl = np.dot(RIList[m], mpdispl)
 
-        Fd = np.dot(SG, mpdispl)    # Prescribed displacement forces vector
+def transform(T, V, inclined=None, transpose=False):
+    '''
+    Applies the member transformations T = Rot.RI, or their transposes, to
+    the member end vectors V shaped (..., nmembers, 6). Members without
+    inclined supports are rotated in closed form, end by end.
+    '''
+    if inclined is None:
+        inclined = np.ones(len(T), dtype=bool)
+    V = np.asarray(V, dtype=float)
 
-        # Prescr. displ. forces arrangement
-        for i in range(6):
-            pr = MemberDOF[m][i]
-            if pr >= 0:
-                FPdispl[pr] += Fd[i]
+    cos, sin = T[:, 0, 0, None], T[:, 0, 1, None]
+    if transpose:
+        sin = -sin
+    R = np.copy(V)
+    R[..., 0::3] = cos*V[..., 0::3] + sin*V[..., 1::3]
+    R[..., 1::3] = -sin*V[..., 0::3] + cos*V[..., 1::3]
 
-        # Member SM arrangement
-        for i in range(6):
-            for j in range(6):
-                pr, pc = MDOFIndex[m][i], MDOFIndex[m][j]
-                pr, pc = DOF[pr], DOF[pc]
-                if pr >= 0 and pc >= 0:
-                    SDOF[pr][pc] += SG[i][j]
+    if np.any(inclined):
+        path = 'mji,...mj->...mi' if transpose else 'mij,...mj->...mi'
+        R[..., inclined, :] = np.einsum(path, T[inclined],
+                                        V[..., inclined, :])
+    return R
 
-    # Spring constants arrangemens
-    for i in range(len(DOF)):
-        pr = DOF[i]
-        if pr >= 0:
-            SDOF[pr][pr] += springs[i]
 
-    # ----------------- MEMBER LOAD VECTORS -------------------------
-    # Converting member loads into member-local coordinates
-    QX = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    QY = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-
-    for member in Sta.membersList:
-        m = Sta.membersList.index(member)
-        cos, sin = np.cos(member.theta), np.sin(member.theta)
-        for i in range(len(Sta.loadcasesList)):
-            if member.qtype[i] == 0:
-                QX[m][i] = member.qx[i]*cos + member.qy[i]*sin
-                QY[m][i] = member.qx[i]*(-sin) + member.qy[i]*cos
-            else:
-                QX[m][i] = member.qx[i]
-                QY[m][i] = member.qy[i]
-
-    # Member load vectors
-    F0 = [np.zeros(ndof) for i in range(ncases)]
-    F0List = [[] for i in range(ncases)]
-
-    for m in range(nmembers):
-        material = next((material for material in Sta.materialsList if
-                         material.name == Sta.membersList[m].material), None)
-        section = next((section for section in Sta.sectionsList if
-                        section.name == Sta.membersList[m].section), None)
-
-        L = Sta.membersList[m].length
-        E, alpha = material.elasticity, material.thermal
-        I, A = section.inertia, section.area
-        ysup, yinf = section.ysup, section.yinf
-        e, f = member.tensile, member.curvature
-
-        Fimp = np.array([e*E*A/L, 0, 8*E*I*f/L**2,
-                        -e*E*A/L, 0, -8*E*I*f/L**2])  # Initial imperf. vector
+def factorization(Sta, model, SList):
+    '''
+    Returns the solve function of the linear global stiffness matrix. The
+    last factorization is kept in Sta.factorization: while the DOFs are
+    numbered the same and the members and springs changed since then
+    touch few DOFs (see solver.UPDATE_RANK), it is updated by the
+    Sherman-Morrison-Woodbury identity instead of assembling and
+    factorizing the matrix again.
+    '''
+    ndof, DOF, MemberDOF = model.ndof, model.DOF, model.MemberDOF
+
+    cache = Sta.factorization
+    if (len(cache) > 0 and np.array_equal(cache[0], DOF) and
+            np.array_equal(cache[1], MemberDOF)):
+        S0, springs0, factor = cache[2:]
+        changed = np.any(SList != S0, axis=(1, 2))
+        J, D = solver.lowRank(MemberDOF[changed], SList[changed]-S0[changed],
+                              DOF, model.springs-springs0)
+        if solver.updatable(factor, J):
+            return solver.updated(factor, J, D)
+
+    kind = solver.backend(ndof)
+    SDOF = solver.assemble(ndof, MemberDOF, SList, DOF, model.springs, kind)
+    solve = solver.factorize(SDOF)
+    Sta.factorization = [DOF, MemberDOF, SList, model.springs,
+                         [solve, np.zeros((ndof, 0)), np.zeros(0, dtype=int)]]
+    return solve
 
-        for n in range(ncases):
-            cfactors = comboFactors(Sta, n)  # Combo factors for a given case
 
-            qx, qy = np.dot(cfactors, QX[m]), np.dot(cfactors, QY[m])
-            Tsup = np.dot(cfactors, np.asarray(Sta.membersList[m].Tsup))
-            Tinf = np.dot(cfactors, np.asarray(Sta.membersList[m].Tinf))
+def linear(Sta):
+    '''
+    Solves the structure using the default Stiffness Method.
+    Only the loadcases are solved; the combinations are then obtained
+    by superposition.
+    '''
+    # ---------------------- INITIAL PARAMETERS -------------------------
+
+    model = compileModel(Sta)
+
+    # Base solutions: one per loadcase, plus the load-independent one
+    nbase = model.nbase
+    ncases = nbase + 1
+    KF = baseFactors(Sta)  # Loadcase factors
+
+    DOF, ndof, pdispl = model.DOF, model.ndof, model.pdispl
+    MDOFIndex, MemberDOF, T = model.MDOFIndex, model.MemberDOF, model.T
+
+    # ---------------------- NODAL FORCES VECTORS ------------------------
 
-            T0 = (Tsup*ysup+Tinf*yinf)/(ysup+yinf)
-            dT = Tsup-Tinf
-            h = ysup+yinf
+    FI, FN = model.nodalForces(KF)
 
-            Fq = np.array([qx*L/2, qy*L/2, qy*L*L/12,
-                           qx*L/2, qy*L/2, -qy*L*L/12])  # Linear loads vector
-            FT = np.array([-alpha*E*A*T0, 0, alpha*E*I*dT/h,
-                           alpha*E*A*T0, 0, -alpha*E*I*dT/h])  # Thermal vector
+    # ------------------------------- STIFFNESS MATRICES ----------------------
 
-            F0L = Fq+FT+Fimp
-            F0List[n].append(F0L)
+    prop = model.properties
+    SList = globalStiffness(localStiffness(prop.L, prop.E, prop.A, prop.I), T,
+                            model.inclined)
 
-            F0G = np.dot(RIList[m].T, np.dot(RotList[m].T, F0L))
+    # Prescribed displacement forces
+    Fd = np.einsum('mij,mj->mi', SList, model.mpdispl)
+    FPdispl = solver.scatter(MemberDOF, Fd, ndof)
 
-            for i in range(6):
-                pr = MemberDOF[m][i]
-                if pr >= 0:
-                    F0[n][pr] += F0G[i]
+    # ----------------- MEMBER LOAD VECTORS -------------------------
+    # Imperfections are load-independent: they go to the last base solution
+    F0List = model.memberLoads(KF)
+    F0List[nbase] += model.Fimp
+    F0 = memberForces(model, F0List)
 
     # -------------------------- FINAL RESULTS --------------------------
 
-    d, Fe = [[] for i in range(ncases)], [[] for i in range(ncases)]
-    FR = [[[0, 0, 0] for j in range(nnodes)] for i in range(ncases)]
+    # Final forces vectors, one column per loadcase/combination
+    F = (F0 + FN).T
+    F[:, nbase] -= FPdispl
+
+    # Displacements vectors: the stiffness matrix is factorized only once
+    # (or the last factorization updated), or the conjugate gradient
+    # method iterates on all the columns at once
+    solverType = Sta.solverType.get()
+    if solverType == 0:
+        solve = factorization(Sta, model, SList)
+        displacements = solve(F).reshape(ndof, ncases)
+        Sta.convergence = []
+    else:
+        kind = ['jacobi', 'cholesky'][solverType-1]
+        displacements, iterations, residuals = solver.pcg(
+            ndof, MemberDOF, SList, DOF, model.springs, F, Sta.maxerror, kind)
+        Sta.convergence = ['PCG', iterations, residuals]
 
-    for n in range(ncases):
-        # Final forces vector
-        F = F0[n] + FN[n] - FPdispl
+    # Displacements at every DOF index, prescribed ones included
+    dDOFList = np.zeros((len(DOF), ncases))
+    dDOFList[:, nbase] = pdispl
+    dDOFList[DOF >= 0] = displacements[DOF[DOF >= 0]]
 
-        # Displacements vector
-        displacements = np.dot(np.linalg.inv(SDOF), F)
-        dDOF = []
-        for i in range(len(DOF)):
-            if DOF[i] < 0:
-                dDOF.append(pdispl[i])
-            else:
-                dDOF.append(displacements[DOF[i]])
-
-        # Internal forces vectors
-        for m in range(nmembers):
-            n1, n2 = Sta.membersList[m].nodes[0], Sta.membersList[m].nodes[1]
-            mdx = MDOFIndex[m]
-            dm1 = np.array([dDOF[mdx[0]], dDOF[mdx[1]], dDOF[mdx[2]],
-                           dDOF[mdx[3]], dDOF[mdx[4]], dDOF[mdx[5]]])
-            dm2 = np.dot(np.dot(RotList[m], RIList[m]), dm1)
-            d[n].append(dm2)
-
-            print([dm1[0], dm1[1], dm1[3], dm1[4]])
-
-            FeG = np.dot(SList[m], dm1)
-            FeL = np.dot(np.dot(RotList[m], RIList[m]), FeG) - F0List[n][m]
-            Fe[n].append(FeL)
-            FG = np.dot(RIList[m].T, np.dot(RotList[m].T, FeL))
-            for i in range(3):
-                if Sta.nodesList[n1].restr[i] == 1:
-                    FR[n][n1][i] += FG[i] - forces[n][3*n1+i]
-                if Sta.nodesList[n2].restr[i] == 1:
-                    FR[n][n2][i] += FG[3+i] - forces[n][3*n2+i]
+    # Member end displacements and internal forces, (ncases, nmembers, 6)
+    dm1 = np.transpose(dDOFList[MDOFIndex], (2, 0, 1))
+    d = transform(T, dm1, model.inclined)
+    FeG = np.einsum('mij,nmj->nmi', SList, dm1)
+    Fe = transform(T, FeG, model.inclined) - F0List
+    FG = transform(T, Fe, model.inclined, transpose=True)
 
-    for n in range(ncases):
-        for i in range(nnodes):
-            cos = np.cos(-Sta.nodesList[i].restr[3])
-            sin = np.sin(-Sta.nodesList[i].restr[3])
-            a = FR[n][i][0]*cos + FR[n][i][1]*(-sin)
-            b = FR[n][i][0]*sin + FR[n][i][1]*cos
-            FR[n][i][0], FR[n][i][1] = a, b
+    # Support reactions, at the restrained DOF indices
+    FR = reactions(FG, FI, DOF < 0, MDOFIndex, model.owner, model.comp,
+                   model.restr)
 
-    return [Fe, d, FR]
+    Sta.baseResults = [Fe, d, FR]
 
+    return [superpose(Sta, result) for result in Sta.baseResults]
 
-def galambos(Sta):
+
+def galambosProblem(Sta):
     '''
-    Solves the structure using the nonlinear Galambos' method.
+    Gathers everything Galambos' method needs to solve any of the loadcases
+    and combinations, as plain arrays, so the cases can be solved without
+    the canvas (e.g. in worker processes).
     '''
+    model = compileModel(Sta)
+    ndof = model.ndof
+    KF = factorMatrix(Sta)  # Combination factors
+
+    # Member load vectors, and the load vectors which do not depend on the
+    # axial forces (member and nodal loads)
+    F0List = model.memberLoads(KF) + model.Fimp
+    FI, FN = model.nodalForces(KF)
+    FL = memberForces(model, F0List) + FN
+
+    # Assembly structure (and ordering) of the global stiffness matrix,
+    # shared by every case and iteration: only the values change
+    pattern = solver.structure(ndof, model.MemberDOF, model.DOF,
+                               solver.backend(ndof))
+
+    # Reactions are found at restrained and spring supported DOF indices
+    supported = (model.DOF < 0) | (model.springs != 0)
+
+    prop = model.properties
+    return {'ndof': ndof, 'DOF': model.DOF, 'MDOFIndex': model.MDOFIndex,
+            'MemberDOF': model.MemberDOF, 'springs': model.springs,
+            'pdispl': model.pdispl, 'mpdispl': model.mpdispl, 'T': model.T,
+            'inclined': model.inclined,
+            'owner': model.owner, 'comp': model.comp, 'restr': model.restr,
+            'FI': FI, 'supported': supported,
+            'L': prop.L, 'E': prop.E, 'A': prop.A, 'I': prop.I,
+            'F0List': F0List, 'FL': FL, 'pattern': pattern,
+            'niter': Sta.maxiter, 'tol': Sta.maxerror,
+            'acceleration': Sta.acceleration.get(), 'refresh': Sta.refresh}
+
+
+def accelerator(method, depth=5):
+    '''
+    Creates the update of the axial forces fixed point P = g(P) solved by
+    Galambos' method: given the current forces P and the residual
+    R = g(P) - P, it returns the next forces. The method is 0 (plain
+    iteration, P = g(P)), 1 (Aitken's dynamic relaxation) or 2 (Anderson
+    mixing over the last depth iterations, restarted whenever the residual
+    grows).
+    '''
+    history, omega = [], 1.0
+
+    def update(P, R):
+        nonlocal omega
+        if method == 1:
+            if history:
+                dR = R - history[-1]
+                if np.dot(dR, dR) > 0:
+                    omega = -omega*np.dot(history[-1], dR)/np.dot(dR, dR)
+            history[:] = [R]
+            return P + omega*R
+
+        if method == 2:
+            if history and np.dot(R, R) > np.dot(history[-1][1],
+                                                 history[-1][1]):
+                history[:] = []
+            history.append([P+R, R])
+            del history[:-depth-1]
+            if len(history) > 1:
+                dG = np.diff([h[0] for h in history], axis=0)
+                dR = np.diff([h[1] for h in history], axis=0)
+                gamma = np.linalg.lstsq(dR.T, R, rcond=None)[0]
+                return P + R - np.dot(gamma, dG)
+
+        return P + R
+
+    return update
+
+
+def galambosSeeds(problem):
+    '''
+    Finds the axial forces of the linear solution of every case of a
+    Galambos problem, (ncases, nmembers), as the starting point of its
+    iterations: the linear stiffness matrix is factorized once and all the
+    cases are solved as one block.
+    '''
+    DOF, ndof, pattern = problem['DOF'], problem['ndof'], problem['pattern']
+    MemberDOF, T = problem['MemberDOF'], problem['T']
+    inclined = problem['inclined']
 
-    # ----------------------- INITIAL PARAMETERS -----------------------
-    # Numbers of nodes, members and loadcases/COMBINATIONS
-    nnodes, nmembers = len(Sta.nodesList), len(Sta.membersList)
-    ncases = len(Sta.loadcasesList)+len(Sta.COMBINATIONSList)
+    SList = globalStiffness(localStiffness(problem['L'], problem['E'],
+                                           problem['A'], problem['I']),
+                            T, inclined)
+    Fd = np.einsum('mij,mj->mi', SList, problem['mpdispl'])
+    F = problem['FL'] - solver.scatter(MemberDOF, Fd, ndof)
 
-    # Number of elements per node:
-    nelem = np.zeros(nnodes)
-    for member in Sta.membersList:
-        n1, n2 = member.nodes[0], member.nodes[1]
-        nelem[n1] += 1
-        nelem[n2] += 1
-
-    # Nodal hinges
-    DOFextras, mdone = np.zeros(nnodes), np.zeros(nnodes)
-    for i in range(nnodes):
-        if Sta.nodesList[i].hinge == 1 and nelem[i] > 0:
-            DOFextras[i] = nelem[i] - 1
-
-    # Internal hinges
-    DOFint, mintdone = np.zeros(nnodes), np.zeros(nnodes)
-    for member in Sta.membersList:
-        n1, n2 = member.nodes[0], member.nodes[1]
-        if (member.nlib[0] == 1 and
-                Sta.nodesList[n1].hinge == 0 and nelem[n1] > 1):
-            DOFint[n1] += 1
-        if (member.nlib[1] == 1 and
-                Sta.nodesList[n2].hinge == 0 and nelem[n2] > 1):
-            DOFint[n2] += 1
-
-    for i in range(nnodes):
-        if DOFint[i] == nelem[i]:
-            DOFextras[i] = nelem[i] - 1
-            DOFint[i] = 0
-
-    # Springs and prescribed displacement vectors
-    springs, pdispl = [], []
-    for node in Sta.nodesList:
-        i = Sta.nodesList.index(node)
-        springs.append(node.springs[0])
-        springs.append(node.springs[1])
-        springs.append(node.springs[2])
-
-        pdispl.append(node.pdispl[0])
-        pdispl.append(node.pdispl[1])
-        pdispl.append(node.pdispl[2])
-
-        for j in range(int(DOFextras[i])):
-            springs.append(node.springs[2])
-            pdispl.append(node.pdispl[2])
-
-        for j in range(int(DOFint[i])):
-            springs.append(node.springs[2])
-            pdispl.append(node.pdispl[2])
-
-    # DOF vector creation
-    DOF, ndof = [], 0
-    for node in Sta.nodesList:
-        i = Sta.nodesList.index(node)
-        if node.restr[0] > 0:
-            DOF.append(-1)
-        else:
-            DOF.append(ndof)
-            ndof += 1
+    SDOF = solver.fill(pattern, MemberDOF, SList, DOF, problem['springs'])
+    displacements = solver.refactorize(pattern, SDOF)(F.T)
 
-        if node.restr[1] > 0:
-            DOF.append(-1)
-        else:
-            DOF.append(ndof)
-            ndof += 1
+    # Displacements at every DOF index, prescribed ones included
+    dDOF = np.tile(problem['pdispl'], (len(F), 1))
+    dDOF[:, DOF >= 0] = displacements[DOF[DOF >= 0]].T
 
-        if node.restr[2] > 0 and DOFextras[i] == 0 and DOFint[i] == 0:
-            DOF.append(-1)
-        else:
-            if DOFextras[i] != 0:
-                for j in range(int(DOFextras[i])+1):
-                    DOF.append(ndof)
-                    ndof += 1
-            elif DOFint[i] != 0:
-                for j in range(int(DOFint[i])+1):
-                    DOF.append(ndof)
-                    ndof += 1
-            else:
-                DOF.append(ndof)
-                ndof += 1
-
-    # Member DOF lists
-    MemberDOF = []
-    MDOFIndex = []
-    for member in Sta.membersList:
-        n1, n2 = member.nodes[0], member.nodes[1]
-        a1 = int(DOFextras[0:n1].sum(axis=0)+DOFint[0:n1].sum(axis=0)+3*n1)
-        a2 = int(DOFextras[0:n2].sum(axis=0)+DOFint[0:n2].sum(axis=0)+3*n2)
-
-        if DOFextras[n1] != 0:
-            b1 = a1 + int(mdone[n1])
-        elif DOFint[n1] != 0 and member.nlib[0] != 0:
-            mintdone[n1] += 1
-            b1 = a1 + int(mintdone[n1])
-        else:
-            b1 = a1
+    dm1 = dDOF[:, problem['MDOFIndex']]
+    FeG = np.einsum('mij,nmj->nmi', SList, dm1)
+    Fe = transform(T, FeG, inclined) - problem['F0List']
+    return Fe[:, :, 3]
 
-        if DOFextras[n2] != 0:
-            b2 = a2 + int(mdone[n2])
-        elif DOFint[n2] != 0 and member.nlib[1] != 0:
-            mintdone[n2] += 1
-            b2 = a2 + int(mintdone[n2])
-        else:
-            b2 = a2
-
-        mindex = [a1, a1+1, b1+2, a2, a2+1, b2+2]
-        mdof = [DOF[index] for index in mindex]
-
-        if DOFextras[n1] > mdone[n1]:
-            mdone[n1] += 1
-        if DOFextras[n2] > mdone[n2]:
-            mdone[n2] += 1
-
-        MDOFIndex.append(mindex)
-        MemberDOF.append(mdof)
-
-    # ---------------------- NODAL FORCES VECTORS ----------------------
-
-    # Converting nodal forces into global coordinates
-    PX = [np.zeros(len(Sta.loadcasesList)) for i in range(nnodes)]
-    PY = [np.zeros(len(Sta.loadcasesList)) for i in range(nnodes)]
-    MZ = [np.asarray(Sta.nodesList[i].Mz) for i in range(nnodes)]
-    for node in Sta.nodesList:
-        n = Sta.nodesList.index(node)
-        for i in range(len(Sta.loadcasesList)):
-            cos, sin = np.cos(node.Pangle[i]), np.sin(node.Pangle[i])
-            PX[n][i] = node.Px[i]*cos + node.Py[i]*(-sin)
-            PY[n][i] = node.Px[i]*sin + node.Py[i]*cos
-
-    # Nodal forces vectors
-    FN = [np.zeros(ndof) for i in range(ncases)]
-    for n in range(ncases):
-        cfactors = comboFactors(Sta, n)  # Combo factors for a given case
-
-        for i in range(nnodes):
-            # Find the current node's forces for the current case/combination
-            Px = np.dot(cfactors, PX[i])
-            Py = np.dot(cfactors, PY[i])
-            Mz = np.dot(cfactors, MZ[i])
-
-            # Check whether the DOF's are valid, and if so add the nodal forces
-            a = int(DOFextras[0:i].sum(axis=0)+DOFint[0:i].sum(axis=0)+3*i)
-            if DOF[a] >= 0:
-                FN[n][DOF[a]] += Px
-            if DOF[a+1] >= 0:
-                FN[n][DOF[a+1]] += Py
-
-            for j in range(int(DOFextras[i])+1):
-                if DOF[a+2+j] >= 0:
-                    FN[n][DOF[a+2+j]] += Mz
-            for j in range(int(DOFint[i])):
-                if DOF[a+2+j] >= 0:
-                    FN[n][DOF[a+2+j]] += Mz
-
-    # ------------------ ROTATION MATRICES ------------------
-
-    # Member rotation matrices
-    RotList = []
-    for member in Sta.membersList:
-        cos, sin = np.cos(member.theta), np.sin(member.theta)
-        R = np.array([[cos, sin, 0,   0,   0,  0],
-                      [-sin, cos, 0,   0,   0,  0],
-                      [0,   0,  1,   0,   0,  0],
-                      [0,   0,  0,  cos, sin, 0],
-                      [0,   0,  0, -sin, cos, 0],
-                      [0,   0,  0,   0,   0,  1]])
-        RotList.append(R)
-
-    # Oblique support rotation matrices
-    RIList = []
-    for member in Sta.membersList:
-        start = Sta.nodesList[member.nodes[0]]
-        end = Sta.nodesList[member.nodes[1]]
-
-        if start.restr[0]+start.restr[1] == 1:
-            theta1 = -start.restr[3]
-        else:
-            theta1 = 0
 
-        if end.restr[0]+end.restr[1] == 1:
-            theta2 = -end.restr[3]
+def galambosCase(problem, n, P0):
+    '''
+    Solves the n-th loadcase/combination of a Galambos problem, starting
+    from the axial forces P0 (nmembers,) and iterating until the change of
+    the axial forces, relative to the forces, is below the tolerance.
+    Returns [n, Fe, d, FR, iterations, error].
+
+    While the members changed since the last factorization touch few DOFs
+    (see solver.updatable), the factorization is kept and updated by the
+    Sherman-Morrison-Woodbury identity instead of refilling and
+    refactorizing the global matrix, and only then the members whose axial
+    force changed by less than the refresh threshold (relative to the
+    largest force) keep their stiffness matrix. Convergence is only
+    accepted, and the error only reported, on iterations with every member
+    up to date.
+    '''
+    DOF, ndof, pdispl = problem['DOF'], problem['ndof'], problem['pdispl']
+    MDOFIndex, MemberDOF = problem['MDOFIndex'], problem['MemberDOF']
+    springs, T, pattern = problem['springs'], problem['T'], problem['pattern']
+    inclined = problem['inclined']
+    L, E, A, I = problem['L'], problem['E'], problem['A'], problem['I']
+    nmembers = len(L)
+
+    update = accelerator(problem['acceleration'])
+    P1 = np.copy(P0)
+    Pm, SList = np.copy(P0), np.zeros((nmembers, 6, 6))
+    refreshAll, wasExact, error = True, True, np.inf
+    for iterations in range(1, problem['niter']+1):
+
+        # Members to refresh: all of them in the first iteration, once the
+        # tolerance is reached (to confirm the convergence) and whenever
+        # the factorization is not going to be updated
+        m = np.ones(nmembers, dtype=bool)
+        if not refreshAll:
+            stale = (np.absolute(P1-Pm) <=
+                     problem['refresh']*np.max(np.absolute(P1)))
+            J = MemberDOF[changed | ~stale]
+            if solver.updatable(factor, J[J >= 0]):
+                m = ~stale
+        Pm[m] = P1[m]
+        exact = np.array_equal(Pm, P1)
+
+        # The fixed point changes when members go stale or are all
+        # refreshed again: the history of the last one is of no use
+        if exact != wasExact:
+            update = accelerator(problem['acceleration'])
+        wasExact = exact
+
+        # Stability functions
+        C, S = stabilityFunctions(P1[m], L[m], E[m], I[m])
+
+        # Global member stiffness matrices
+        SList[m] = globalStiffness(localStiffness(L[m], E[m], A[m], I[m],
+                                                  C, S, P1[m]), T[m],
+                                   inclined[m])
+
+        # Prescribed displacement forces
+        Fd = np.einsum('mij,mj->mi', SList, problem['mpdispl'])
+        FPdispl = solver.scatter(MemberDOF, Fd, ndof)
+
+        # Low-rank update of the last factorization, if few DOFs changed
+        if not np.all(m):
+            changed |= m
+            J, D = solver.lowRank(MemberDOF[changed],
+                                  SList[changed]-S0[changed])
+            solve = solver.updated(factor, J, D)
+
+        # Global stiffness matrix, refilled on the same structure and
+        # refactorized (numeric factorization only)
         else:
-            theta2 = 0
-        cos1, sin1 = np.cos(theta1), np.sin(theta1)
-        cos2, sin2 = np.cos(theta2), np.sin(theta2)
-
-        RI = np.array([[cos1, sin1, 0,   0,    0,  0],
-                       [-sin1, cos1, 0,   0,    0, 0],
-                       [0,    0,   1,   0,    0,   0],
-                       [0,    0,   0,  cos2, sin2, 0],
-                       [0,    0,   0, -sin2, cos2, 0],
-                       [0,    0,   0,   0,    0,   1]])
-        RIList.append(RI)
-
-    # ----------------- MEMBER LOAD VECTORS -------------------
-
-    # Converting member loads into member-local coordinates
-    QX = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    QY = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    for member in Sta.membersList:
-        m = Sta.membersList.index(member)
-        cos, sin = np.cos(member.theta), np.sin(member.theta)
-        for i in range(len(Sta.loadcasesList)):
-            if member.qtype[i] == 0:
-                QX[m][i] = member.qx[i]*cos + member.qy[i]*sin
-                QY[m][i] = member.qx[i]*(-sin) + member.qy[i]*cos
-            else:
-                QX[m][i] = member.qx[i]
-                QY[m][i] = member.qy[i]
-
-    # Member load vectors
-    F0 = [np.zeros(ndof) for i in range(ncases)]
-    F0List = [[] for i in range(ncases)]
-
-    for m in range(nmembers):
-        material = next((material for material in Sta.materialsList if
-                         material.name == Sta.membersList[m].material), None)
-        section = next((section for section in Sta.sectionsList if
-                        section.name == Sta.membersList[m].section), None)
-
-        L = Sta.membersList[m].length
-        E, alpha = material.elasticity, material.thermal
-        I, A = section.inertia, section.area
-        ysup, yinf = section.ysup, section.yinf
-        e, f = member.tensile, member.curvature
-
-        Fimp = np.array([e*E*A/L, 0, 8*E*I*f/L**2,
-                        -e*E*A/L, 0, -8*E*I*f/L**2])  # Initial imperf. vector
+            SDOF = solver.fill(pattern, MemberDOF, SList, DOF, springs)
+            solve = solver.refactorize(pattern, SDOF)
+            factor = [solve, np.zeros((ndof, 0)), np.zeros(0, dtype=int)]
+            S0, changed = np.copy(SList), np.zeros(nmembers, dtype=bool)
 
-        for n in range(ncases):
-            cfactors = comboFactors(Sta, n)  # Combo factors for a given case
-
-            qx, qy = np.dot(cfactors, QX[m]), np.dot(cfactors, QY[m])
-            Tsup = np.dot(cfactors, np.asarray(Sta.membersList[m].Tsup))
-            Tinf = np.dot(cfactors, np.asarray(Sta.membersList[m].Tinf))
-
-            T0 = (Tsup*ysup+Tinf*yinf)/(ysup+yinf)
-            dT = Tsup-Tinf
-            h = ysup+yinf
-
-            Fq = np.array([qx*L/2, qy*L/2, qy*L*L/12,
-                           qx*L/2, qy*L/2, -qy*L*L/12])  # Linear loads vector
-            FT = np.array([-alpha*E*A*T0, 0, alpha*E*I*dT/h,
-                           alpha*E*A*T0, 0, alpha*E*I*dT/h])  # Thermal vector
-            F0L = Fq+FT+Fimp
-            F0List[n].append(F0L)
-
-            F0G = np.dot(RIList[m].T, np.dot(RotList[m].T, F0L))
-
-            for i in range(6):
-                pr = MemberDOF[m][i]
-                if pr >= 0:
-                    F0[n][pr] += F0G[i]
-
-    # ------------------- LINEAR ITERATIONS -------------------
-    niter, tol = Sta.maxiter, Sta.maxerror
-
-    # Stiffness matrices list
-    SList = [[] for i in range(ncases)]
-    # Prescribed displacement forces list
-    FPdispl = [np.zeros(ndof) for i in range(ncases)]
-    # Global stiffness matrices
-    SDOF = [np.zeros((ndof, ndof)) for i in range(ncases)]
-    # Displacement vectors
-    d, Fe = [[] for i in range(ncases)], [[] for i in range(ncases)]
-    # Reaction forces
-    FR = [[[0, 0, 0] for j in range(nnodes)] for i in range(ncases)]
+        # Final forces vector
+        F = problem['FL'][n] - FPdispl
 
-    for n in range(ncases):
-        P2 = np.zeros(nmembers)
+        # Displacements vector
+        displacements = solve(F)
 
-        for i in range(niter):
-            P1 = np.copy(P2)
-            d[n], Fe[n], SList[n] = [], [], []
-            SDOF[n] = np.zeros((ndof, ndof))
-            FR[n] = [[0, 0, 0] for j in range(nnodes)]
+        # Displacements at every DOF index, prescribed ones included
+        dDOF = np.copy(pdispl)
+        dDOF[DOF >= 0] = displacements[DOF[DOF >= 0]]
 
-            # Stiffness matrices
-            for m in range(nmembers):
-                L = Sta.membersList[m].length
-
-                material = next((material for material in Sta.materialsList if
-                                 material.name == Sta.membersList[m].material),
-                                None)
-                section = next((section for section in Sta.sectionsList if
-                                section.name == Sta.membersList[m].section),
-                               None)
-
-                E, I, A = material.elasticity, section.inertia, section.area
-
-                P = P1[m]
-
-                if np.absolute(P) < 1e-6 or E*I < 1e-6:
-                    C, S = 4, 2
-                else:
-                    bL = np.sqrt(np.absolute(P)/(E*I))*L
-                    if P < 0:
-                        c = (1-bL/np.tan(bL))/bL**2
-                        s = (bL/np.sin(bL) - 1)/bL**2
-                    else:
-                        c = (bL/np.tanh(bL)-1)/bL**2
-                        s = (1-bL/np.sinh(bL))/bL**2
-                    C, S = c/(c*c-s*s), s/(c*c-s*s)
-
-                a = [E*A/L, 2*E*I*(C+S)/L**3+P/L,
-                     E*I*(C+S)/L**2, C*E*I/L, S*E*I/L]
-
-                # Local member stiffness matrix
-                SL = np.array([[a[0],  0,     0,   -a[0],  0,     0],
-                               [0,   a[1],  a[2],   0,  -a[1],  a[2]],
-                               [0,   a[2],  a[3],   0,  -a[2],  a[4]],
-                               [-a[0],  0,     0,    a[0],  0,     0],
-                               [0,  -a[1], -a[2],   0,   a[1], -a[2]],
-                               [0,   a[2],  a[4],   0,  -a[2],  a[3]]])
-
-                # Global member stiffness matrix
-                SG = np.dot(RIList[m].T, np.dot(RotList[m].T, SL))
-                SG = np.dot(SG, np.dot(RotList[m], RIList[m]))
-                SList[n].append(SG)
-
-                # Prescribed displacements vector
-                mdx = MDOFIndex[m]
-                mpdispl = np.array([pdispl[mdx[0]], pdispl[mdx[1]],
-                                    pdispl[mdx[2]], pdispl[mdx[3]],
-                                    pdispl[mdx[4]], pdispl[mdx[5]]])
-
-                mpdispl = np.dot(RIList[m], mpdispl)
-
-                Fd = np.dot(SG, mpdispl)  # Prescribed displ. forces vector
-
-                # Prescr. displ. forces arrangement
-                for i in range(6):
-                    pr = MemberDOF[m][i]
-                    if pr >= 0:
-                        FPdispl[n][pr] += Fd[i]
-
-                # Member SM arrangement
-                for i in range(6):
-                    for j in range(6):
-                        pr, pc = MemberDOF[m][i], MemberDOF[m][j]
-                        if pr >= 0 and pc >= 0:
-                            SDOF[n][pr][pc] += SG[i][j]
-
-            # Spring constants arrangemens
-            for i in range(len(DOF)):
-                pr = DOF[i]
-                if pr >= 0:
-                    SDOF[n][pr][pr] += springs[i]
-
-            # Final forces vector
-            F = F0[n] + FN[n] - FPdispl[n]
-
-            # Displacements vector
-            displacements = np.dot(np.linalg.inv(SDOF[n]), F)
-
-            dDOF = []
-            for i in range(len(DOF)):
-                if DOF[i] < 0:
-                    dDOF.append(pdispl[i])
-                else:
-                    dDOF.append(displacements[DOF[i]])
-
-            dx = np.zeros(nnodes)
-            dy = np.zeros(nnodes)
-            rz = np.zeros(nnodes)
-
-            # Internal forces vectors
-            for m in range(nmembers):
-                n1 = Sta.membersList[m].nodes[0]
-                n2 = Sta.membersList[m].nodes[1]
-
-                mdx = MDOFIndex[m]
-                dm1 = np.array([dDOF[mdx[0]], dDOF[mdx[1]], dDOF[mdx[2]],
-                               dDOF[mdx[3]], dDOF[mdx[4]], dDOF[mdx[5]]])
-                dx[n1] = dm1[0]
-                dy[n1] = dm1[1]
-                rz[n1] = dm1[2]
-
-                dx[n2] = dm1[3]
-                dy[n2] = dm1[4]
-                rz[n2] = dm1[5]
-
-                dm2 = np.dot(np.dot(RotList[m], RIList[m]), dm1)
-                d[n].append(dm2)
-                FeG = np.dot(SList[n][m], dm1)
-
-                FeL = np.dot(np.dot(RotList[m], RIList[m]), FeG) - F0List[n][m]
-                Fe[n].append(FeL)
-                FG = np.dot(RIList[m].T, np.dot(RotList[m].T, FeL))
-
-                P2[m] = FeL[3]
-
-                for i in range(3):
-                    if (Sta.nodesList[n1].restr[i] == 1 or
-                            Sta.nodesList[n1].springs[i]):
-                        FR[n][n1][i] += FG[i]
-                    if (Sta.nodesList[n2].restr[i] == 1 or
-                            Sta.nodesList[n2].springs[i]):
-                        FR[n][n2][i] += FG[3+i]
-
-            # Checking for convergence
-            dP = np.add(P2, -P1)
-            if np.linalg.norm(dP) < tol:
-                break
+        # Member end displacements and internal forces
+        dm1 = dDOF[MDOFIndex]
+        d = transform(T, dm1, inclined)
+        FeG = np.einsum('mij,mj->mi', SList, dm1)
+        Fe = transform(T, FeG, inclined) - problem['F0List'][n]
 
-    for n in range(ncases):
-        for i in range(nnodes):
-            cos = np.cos(-Sta.nodesList[i].restr[3])
-            sin = np.sin(-Sta.nodesList[i].restr[3])
-            a = FR[n][i][0]*cos + FR[n][i][1]*(-sin)
-            b = FR[n][i][0]*sin + FR[n][i][1]*cos
-            FR[n][i][0], FR[n][i][1] = a, b
+        P2 = Fe[:, 3]
 
-    return [Fe, d, FR]
+        # Checking for convergence (relative to the axial forces), which
+        # with stale members has to be confirmed by refreshing them all
+        dP = np.add(P2, -P1)
+        residual = np.linalg.norm(dP)/max(np.linalg.norm(P2), 1e-12)
+        if exact:
+            error = residual
+        if exact and error < problem['tol']:
+            break
+        refreshAll = residual < problem['tol']
+        if not refreshAll:
+            P1 = update(P1, dP)
 
+    # Support reactions
+    FG = transform(T, Fe, inclined, transpose=True)
+    FR = reactions(FG, problem['FI'][n], problem['supported'], MDOFIndex,
+                   problem['owner'], problem['comp'], problem['restr'])
 
-def dispLinear(Sta):
+    return [n, Fe, d, FR, iterations, error]
+
+
+# Galambos problem of a worker process, shipped once by its initializer
+workerProblem = None
+
+
+def galambosInit(problem):
     '''
-    Finds the member deflections for linear analysis,
-    using the direct integration method.
+    Initializer of the worker processes: keeps the Galambos problem.
     '''
-    ncases = len(Sta.loadcasesList) + len(Sta.COMBINATIONSList)
-    nmembers = len(Sta.membersList)
+    global workerProblem
+    workerProblem = problem
 
-    QX = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    QY = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    for member in Sta.membersList:
-        m = Sta.membersList.index(member)
-        cos, sin = np.cos(member.theta), np.sin(member.theta)
-        for i in range(len(Sta.loadcasesList)):
-            if member.qtype[i] == 0:
-                QX[m][i] = member.qx[i]*cos + member.qy[i]*sin
-                QY[m][i] = member.qx[i]*(-sin) + member.qy[i]*cos
-            else:
-                QX[m][i] = member.qx[i]
-                QY[m][i] = member.qy[i]
 
-    maxdispl = 0
-    results = []
-    for n in range(ncases):
-        results.append([])
-        k = comboFactors(Sta, n)
-        for m in range(nmembers):
-            L = Sta.membersList[m].length
-            dn = Sta.results[1][n][m]
-            V, M = Sta.results[0][n][m][1], -Sta.results[0][n][m][2]
+def galambosWorker(case):
+    '''
+    Solves a case [n, P0] in a worker process.
+    '''
+    return galambosCase(workerProblem, *case)
 
-            qy = np.dot(k, QY[m])
 
-            material = next((material for material in Sta.materialsList if
-                             material.name == Sta.membersList[m].material),
-                            None)
-            section = next((section for section in Sta.sectionsList if
-                            section.name == Sta.membersList[m].section),
-                           None)
-            E, I = material.elasticity, section.inertia
+def galambosBatch(problem, pool, cases):
+    '''
+    Solves a list of cases [n, P0] of a Galambos problem, in the pool of
+    processes if there is one, yielding their results in order.
+    '''
+    if pool is not None:
+        for result in pool.map(galambosWorker, cases):
+            yield result
+    else:
+        for n, P0 in cases:
+            yield galambosCase(problem, n, P0)
 
-            nsteps = max(100, int(L/20))
-            nsteps = min(nsteps, 1000)
-            nsteps = 20
 
-            h = L/nsteps
+def galambosCases(Sta):
+    '''
+    Streaming driver of the nonlinear Galambos' method: the loadcases and
+    combinations are solved one at a time, keeping only the working arrays
+    of the current case, and [n, Fe, d, FR, iterations, error] is yielded,
+    in case order, as each case ends. With Sta.workers > 1 the cases are
+    shared by a pool of processes, each one receiving the problem once.
+
+    The axial forces start from zero (Sta.warmStart 0) or from the linear
+    solution of each case (1). With 2, the combinations start instead from
+    their linear solution plus the superposed nonlinear corrections of the
+    converged loadcases, which are solved first.
+    '''
+    problem = galambosProblem(Sta)
+    factors = factorMatrix(Sta)
+    ncases, nloadcases = factors.shape
+    if Sta.warmStart.get() > 0:
+        seeds = galambosSeeds(problem)
+    else:
+        seeds = np.zeros((ncases, len(problem['L'])))
+    Sta.baseResults, Sta.convergence = [], []
+
+    pool = None
+    workers = min(Sta.workers, ncases)
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, initializer=galambosInit,
+                                   initargs=(problem,))
+    try:
+        # Loadcases, keeping the change of their converged axial forces
+        dP = np.zeros((nloadcases, len(problem['L'])))
+        cases = [[n, seeds[n]] for n in range(nloadcases)]
+        for result in galambosBatch(problem, pool, cases):
+            n, Fe, error = result[0], result[1], result[5]
+            if error < problem['tol']:
+                dP[n] = Fe[:, 3] - seeds[n]
+            yield result
+
+        # Combinations
+        if Sta.warmStart.get() == 2:
+            seeds[nloadcases:] += np.dot(factors[nloadcases:], dP)
+        cases = [[n, seeds[n]] for n in range(nloadcases, ncases)]
+        for result in galambosBatch(problem, pool, cases):
+            yield result
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
-            X = np.array([i*h for i in range(1, nsteps)])
-            nn = len(X)
 
-            # Final displacements
-            u = np.array([dn[0] + (dn[3]-dn[0])*X[i]/L for i in range(nn)])
-            v = np.array([dn[1] + dn[2]*X[i] + 1/(E*I)*((M*X[i]**2)/2 +
-                          (V*X[i]**3)/6+(qy*X[i]**4)/24) for i in range(nn)])
-            r = np.array([dn[2] + 1/(E*I)*((V*X[i]**2)/2 +
-                         (qy*X[i]**3)/6) for i in range(nn)])
+def galambos(Sta):
+    '''
+    Solves the structure using the nonlinear Galambos' method, gathering
+    the results of every case from the streaming driver.
+    '''
+    Fe, d, FR, iterations, errors = [], [], [], [], []
+    for n, Fen, dn, FRn, iterationsn, errorn in galambosCases(Sta):
+        Fe.append(Fen)
+        d.append(dn)
+        FR.append(FRn)
+        iterations.append(iterationsn)
+        errors.append(errorn)
+    Sta.convergence = ['Galambos', np.array(iterations), np.array(errors)]
+
+    return [np.array(Fe), np.array(d), np.array(FR)]
+
+
+def polynomials(Sta):
+    '''
+    Finds the exact deflections and internal forces along every member for
+    linear analysis, as polynomials in the distance x to the start node.
+    Returns a (ncases, nmembers, 6, 5) array with the coefficients of u, v,
+    r, N, V and M, in ascending powers of x.
+    '''
+    KF = baseFactors(Sta)  # Loadcase factors
+
+    model = compileModel(Sta)
+    prop = model.properties
+    L, EA, EI = prop.L, prop.E*prop.A, prop.E*prop.I
+    qy = np.dot(KF, model.QY.T)
+
+    Fe, d = np.asarray(Sta.baseResults[0]), np.asarray(Sta.baseResults[1])
+    N, V, M = -Fe[..., 0], Fe[..., 1], -Fe[..., 2]
+    dN = (Fe[..., 3] + Fe[..., 0])/L
+
+    # Initial curvature (thermal gradient and imperfections), from the
+    # rotations of the member ends
+    k = (d[..., 5] - d[..., 2])/L - (M + V*L/2 + qy*L*L/6)/EI
+
+    # Direct integration of the base solutions, then superposed
+    c = np.zeros(Fe.shape[:2] + (6, 5))
+    c[..., 0, 0:3] = np.stack([d[..., 0],
+                               (d[..., 3]-d[..., 0])/L - dN*L/(2*EA),
+                               dN/(2*EA)], axis=-1)
+    c[..., 1, :] = np.stack([d[..., 1], d[..., 2], (M/EI + k)/2, V/EI/6,
+                             qy/EI/24], axis=-1)
+    c[..., 2, 0:4] = np.stack([d[..., 2], M/EI + k, V/EI/2, qy/EI/6],
+                              axis=-1)
+    c[..., 3, 0:2] = np.stack([N, dN], axis=-1)
+    c[..., 4, 0:2] = np.stack([V, qy], axis=-1)
+    c[..., 5, 0:3] = np.stack([M, V, qy/2], axis=-1)
+
+    return superpose(Sta, c)
 
-            X = np.concatenate([[0], X, [L]])
-            u = np.concatenate([[dn[0]], u, [dn[3]]])
-            v = np.concatenate([[dn[1]], v, [dn[4]]])
-            r = np.concatenate([[dn[2]], r, [dn[5]]])
 
-            maxu = np.amax(np.absolute(u))
-            maxv = np.amax(np.absolute(v))
-            maxdispl = max(maxu, maxv, maxdispl)
+# Degrees of the member polynomials of u, v, r, N, V and M
+POLYNOMIAL_DEGREES = [2, 4, 3, 1, 1, 2]
+
+
+def extrema(Sta, quantities=(3, 4, 5)):
+    '''
+    Finds the exact maxima and minima along every member, for linear
+    analysis, of the given quantities (indices of u, v, r, N, V and M in
+    Sta.polynomials; N, V and M by default). They lie at the member ends
+    or at the real roots of the derivatives of the polynomials: for the
+    bending moments, the zero shear point -V/qy. The deflections need the
+    roots of cubics, so they are only found when asked for.
+    Returns [xmax, max, xmin, min], as (ncases, nmembers, nquantities)
+    arrays.
+    '''
+    L = compileModel(Sta).properties.L
+    degree = max(POLYNOMIAL_DEGREES[q] for q in quantities) + 1
+
+    # Polynomials in t = x/L
+    c = (Sta.polynomials[:, :, list(quantities), :degree] *
+         (L[:, None, None]**np.arange(degree)))
+
+    # Stationary points inside the members: the vertex of the (at most)
+    # quadratics, otherwise the real roots of the derivatives
+    if degree <= 3:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = -c[..., 1:2]/(2*c[..., 2:3])
+    else:
+        t = fn.polynomialRoots(c[..., 1:]*np.arange(1, degree))
+    t[(t <= 0) | (t >= 1)] = np.nan
+
+    # Largest and smallest values among the member ends and the
+    # stationary points (nan points are never picked)
+    tmax, ymax = np.zeros(c.shape[:-1]), c[..., 0]
+    tmin, ymin = tmax, ymax
+    for tc in [np.ones(c.shape[:-1])] + list(np.moveaxis(t, -1, 0)):
+        yc = fn.polynomial(c, tc)
+        higher, lower = yc > ymax, yc < ymin
+        tmax, ymax = np.where(higher, tc, tmax), np.where(higher, yc, ymax)
+        tmin, ymin = np.where(lower, tc, tmin), np.where(lower, yc, ymin)
+
+    return [tmax*L[:, None], ymax, tmin*L[:, None], ymin]
+
+
+def dispLinear(Sta):
+    '''
+    Finds the member deflections for linear analysis, as exact polynomials
+    (kept in Sta.polynomials). Returns them as u, v, r and X at
+    Sta.stations equal steps along every member, indexed as the lists of
+    dispNonlinear but only evaluated when read.
+    '''
+    Sta.polynomials = polynomials(Sta)
+    L = compileModel(Sta).properties.L
+    results = MemberResults(Sta.polynomials, L, Sta.stations+1, (0, 1, 2))
 
-            results[n].append([u, v, r, X])
+    # Largest displacement at the stations, one case at a time
+    X = results.stations()
+    maxdispl = 0
+    for P in Sta.polynomials:
+        uv = fn.polynomial(P[:, 0:2, None], X[:, None])
+        maxdispl = max(np.amax(np.absolute(uv), initial=0), maxdispl)
 
     if maxdispl == 0:
         Sta.resultsConstant[0] = 1
@@ -908,93 +764,63 @@ def dispLinear(Sta):
 def dispNonlinear(Sta):
     '''
     Finds the member deflections for nonlinear analysis,
-    using the finite differences method.
+    using the finite differences method. The tridiagonal systems of all
+    the members of a case are padded to the same size and solved together,
+    for the deflections and the rotations at once.
     '''
     ncases = len(Sta.loadcasesList) + len(Sta.COMBINATIONSList)
     nmembers = len(Sta.membersList)
-
-    QX = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    QY = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    for member in Sta.membersList:
-        m = Sta.membersList.index(member)
-        cos, sin = np.cos(member.theta), np.sin(member.theta)
-        for i in range(len(Sta.loadcasesList)):
-            if member.qtype[i] == 0:
-                QX[m][i] = member.qx[i]*cos + member.qy[i]*sin
-                QY[m][i] = member.qx[i]*(-sin) + member.qy[i]*cos
-            else:
-                QX[m][i] = member.qx[i]
-                QY[m][i] = member.qy[i]
+    Sta.polynomials, Sta.extrema = [], []
+
+    model = compileModel(Sta)
+    prop = model.properties
+    L, EI = prop.L, prop.E*prop.I
+    KF = factorMatrix(Sta)
+    qx, qy = np.dot(KF, model.QX.T), np.dot(KF, model.QY.T)
+    Fe, dn = np.asarray(Sta.results[0]), np.asarray(Sta.results[1])
+
+    # Element meshing: inner stations X, padded to the longest member
+    nsteps = np.clip((L/20).astype(int), 100, 1000)
+    h = L/nsteps
+    step = np.arange(1, np.max(nsteps, initial=2))
+    X = step*h[:, None]
+    inner = step < nsteps[:, None]
+    last = nsteps - 2
+    rows = np.arange(nmembers)
+
+    # Coefficients matrix: a out of the diagonal, padding rows decoupled
+    a = EI/h**2
+    off = np.where(inner[:, 1:], a[:, None], 0)
 
     maxdispl = 0
     results = []
     for n in range(ncases):
+        N, V, M = Fe[n, :, 0, None], Fe[n, :, 1, None], Fe[n, :, 2, None]
+        d = dn[n]
+
+        diag = np.where(inner, N - 2*a[:, None] + qx[n, :, None]*X/2, 1)
+
+        # Vectors F (for displacement) and F prime (for rotation)
+        F = np.zeros(X.shape + (2,))
+        F[:, :, 0] = -M + V*X + qy[n, :, None]*X*X/2
+        F[:, :, 1] = V + qy[n, :, None]*X
+        F[:, 0] -= a[:, None]*d[:, [1, 2]]
+        F[rows, last] -= a[:, None]*d[:, [4, 5]]
+        F[~inner] = 0
+
+        vr = solver.tridiagonal(diag, off, F)
+
+        # Final displacements
         results.append([])
-        k = comboFactors(Sta, n)
         for m in range(nmembers):
+            Xm = np.concatenate([[0], X[m, :nsteps[m]-1], [L[m]]])
+            u = d[m, 0] + (d[m, 3]-d[m, 0])*Xm/L[m]
+            v = np.concatenate([[d[m, 1]], vr[m, :nsteps[m]-1, 0], [d[m, 4]]])
+            r = np.concatenate([[d[m, 2]], vr[m, :nsteps[m]-1, 1], [d[m, 5]]])
 
-            # Input parameters
-            L = Sta.membersList[m].length
-            dn = Sta.results[1][n][m]
-            N, V = Sta.results[0][n][m][0], Sta.results[0][n][m][1]
-            M = Sta.results[0][n][m][2]
-
-            qx = np.dot(k, QX[m])
-            qy = np.dot(k, QY[m])
-            material = next((material for material in Sta.materialsList if
-                             material.name == Sta.membersList[m].material),
-                            None)
-            section = next((section for section in Sta.sectionsList if
-                            section.name == Sta.membersList[m].section),
-                           None)
-            E, I = material.elasticity, section.inertia
-
-            # Element meshing
-            nsteps = max(100, int(L/20))
-            nsteps = min(nsteps, 1000)
-
-            h = L/nsteps
-            X = np.array([i*h for i in range(1, nsteps)])
-
-            # Vector F (for displacement)
-            F = np.array([-M+V*X[i]+qy*X[i]*X[i]/2 for i in range(nsteps-1)])
-            F[0] -= E*I*dn[1]/h**2
-            F[nsteps-2] -= E*I*dn[4]/h**2
-
-            # Vector F prime (for rotation)
-            Fp = np.array([V+qy*X[i] for i in range(nsteps-1)])
-            Fp[0] -= E*I*dn[2]/h**2
-            Fp[nsteps-2] -= E*I*dn[5]/h**2
-
-            # Coefficients matrix
-            a, b = E*I/h**2, N-2*E*I/h**2
-
-            A = np.zeros((nsteps-1, nsteps-1))
-            A[0][0], A[0][1] = b + qx*X[0]/2, a
-            A[nsteps-2][nsteps-2], A[nsteps-2][nsteps-3] = b + qx*X[0]/2, a
-
-            for i in range(1, nsteps-2):
-                A[i][i] = b + qx*X[i]/2
-                A[i][i-1] = a
-                A[i][i+1] = a
-
-            Ainv = np.linalg.inv(A)
-
-            # Final displacements
-            u = np.array([dn[0] + (dn[3]-dn[0])*X[i]/L for i in range(len(X))])
-            v = np.dot(Ainv, F)
-            r = np.dot(Ainv, Fp)
-
-            X = np.concatenate([[0], X, [L]])
-            u = np.concatenate([[dn[0]], u, [dn[3]]])
-            v = np.concatenate([[dn[1]], v, [dn[4]]])
-            r = np.concatenate([[dn[2]], r, [dn[5]]])
-
-            maxu = np.amax(np.absolute(u))
-            maxv = np.amax(np.absolute(v))
-            maxdispl = max(maxu, maxv, maxdispl)
-
-            results[n].append([u, v, r, X])
+            maxdispl = max(np.amax(np.absolute(u)), np.amax(np.absolute(v)),
+                           maxdispl)
+            results[n].append([u, v, r, Xm])
 
     if maxdispl == 0:
         Sta.resultsConstant[0] = 1
@@ -1011,34 +837,15 @@ def internalForces(Sta, runtype):
     ncases = len(Sta.loadcasesList) + len(Sta.COMBINATIONSList)
     nmembers = len(Sta.membersList)
 
-    QY = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    QX = [np.zeros(len(Sta.loadcasesList)) for i in range(nmembers)]
-    for member in Sta.membersList:
-        m = Sta.membersList.index(member)
-        cos, sin = np.cos(member.theta), np.sin(member.theta)
-        for i in range(len(Sta.loadcasesList)):
-            if member.qtype[i] == 0:
-                QY[m][i] = member.qx[i]*(-sin) + member.qy[i]*cos
-                QX[m][i] = member.qx[i]*(cos) + member.qy[i]*sin
-            else:
-                QY[m][i] = member.qy[i]
-                QX[m][i] = member.qx[i]
+    model = compileModel(Sta)
+    QX, QY = model.QX, model.QY
 
     results = []
     if runtype == 0:
-        for n in range(ncases):
-            results.append([])
-            k = comboFactors(Sta, n)
-            for m in range(nmembers):
-                N = [-Sta.results[0][n][m][0], Sta.results[0][n][m][3]]
-                V = [Sta.results[0][n][m][1], -Sta.results[0][n][m][4]]
-                M = [-Sta.results[0][n][m][2], Sta.results[0][n][m][5]]
-                qy = np.dot(k, QY[m])
-                X = Sta.displacements[n][m][3]
-
-                Mx = np.array([M[0]+V[0]*X[i]+0.5*qy*X[i]**2
-                               for i in range(len(X))])
-                results[n].append([N, V, Mx, X])
+        # Exact polynomials, evaluated when read: N and V are linear, so
+        # they are given at the member ends only
+        results = MemberResults(Sta.polynomials, model.properties.L,
+                                Sta.stations+1, (3, 4, 5), ends=(3, 4))
 
     else:
         for n in range(ncases):
@@ -1067,99 +874,117 @@ def internalForces(Sta, runtype):
     return results
 
 
-def maxmin(Sta):
+def stations(Sta):
     '''
-    Finds the maxima and minima of the internal forces for each member,
-    across all COMBINATIONS, all loadcases or both.
+    Returns the deflection stations of every member, (nmembers, nstations),
+    padded with nan for the members with fewer stations (nonlinear
+    analysis).
     '''
-    maxType = Sta.maxType.get()
+    if len(Sta.polynomials) > 0:
+        return Sta.forces.stations()
 
-    if maxType == 0:
-        n0 = 0
-        n1 = len(Sta.loadcasesList)+len(Sta.COMBINATIONSList)
-    elif maxType == 1:
-        n0 = 0
-        n1 = len(Sta.loadcasesList)
-    else:
-        n0 = len(Sta.loadcasesList)
-        n1 = len(Sta.loadcasesList)+len(Sta.COMBINATIONSList)
+    Xm = [np.asarray(member[3]) for member in Sta.displacements[0]]
+    X = np.full((len(Xm), max(len(x) for x in Xm)), np.nan)
+    for m, x in enumerate(Xm):
+        X[m, :len(x)] = x
+    return X
 
-    Sta.max = [[] for i in range(len(Sta.membersList))]
-    Sta.min = [[] for i in range(len(Sta.membersList))]
 
-    for member in range(len(Sta.membersList)):
-        maxnormal = np.zeros(n1-n0)
-        minnormal = np.zeros(n1-n0)
-        for case in range(n0, n1):
-            imax = np.argmax(Sta.forces[case][member][0])
-            imin = np.argmin(Sta.forces[case][member][0])
+def stationForces(Sta, n, X):
+    '''
+    Returns N, V and M of the n-th case at the stations X of every member
+    (see stations), as a (nmembers, 3, nstations) array, nan where X is.
+    '''
+    if len(Sta.polynomials) > 0:
+        # N, V and M are at most quadratic
+        return fn.polynomial(Sta.polynomials[n, :, 3:, None, :3], X[:, None])
 
-            maxnormal[case-n0] = Sta.forces[case][member][0][imax]
-            minnormal[case-n0] = Sta.forces[case][member][0][imin]
+    F = np.full((len(X), 3, X.shape[1]), np.nan)
+    for m, forces in enumerate(Sta.forces[n]):
+        N, V, M = forces
+        k = len(M)
+        F[m, 0, :k] = N[0] + (N[1]-N[0])*X[m, :k]/X[m, k-1]
+        F[m, 1:, :k] = V, M
+    return F
 
-        casemax = np.argmax(maxnormal)
-        Sta.max[member].append(maxnormal[casemax])
-        Sta.max[member].append(casemax)
 
-        casemin = np.argmin(minnormal)
+def envelope(Sta):
+    '''
+    Finds the maxima and minima of N, V and M over the loadcases and over
+    the combinations, with their governing cases, for every member (exact
+    for linear analysis) and at every station, in a single pass over the
+    cases. maxmin then picks from them according to Sta.maxType.
+    Also sets the scale of the diagrams, over all members and cases.
+    '''
+    nl = len(Sta.loadcasesList)
+    ncases = nl + len(Sta.COMBINATIONSList)
+    X = stations(Sta)
+
+    # (groups, max/min, nmembers, 3, 1+nstations): whole members first,
+    # then the stations
+    shape = (2, 2, len(X), 3, 1+X.shape[1])
+    values, cases = np.full(shape, -np.inf), np.zeros(shape, dtype=int)
+    G = np.empty(shape[1:])
+    for n in range(ncases):
+        F = stationForces(Sta, n, X)
+        if len(Sta.extrema) > 0:
+            high, low = Sta.extrema[1][n], Sta.extrema[3][n]
+        else:
+            high, low = np.nanmax(F, axis=-1), np.nanmin(F, axis=-1)
+
+        # The minima as maxima of -F; the first case governs on ties, and
+        # the stations out of the members (nan) never do
+        G[0, ..., 0], G[0, ..., 1:] = high, F
+        G[1, ..., 0], G[1, ..., 1:] = -low, -F
+        group = int(n >= nl)
+        higher = G > values[group]
+        np.copyto(values[group], G, where=higher)
+        np.copyto(cases[group], n, where=higher)
+
+    Sta.envelope = [X, values, cases]
+
+    # Scale of the diagrams: largest absolute value of every force
+    scale = np.amax(values, axis=(0, 1, 2, 4))
+    for i in range(3):
+        if scale[i] == 0:
+            Sta.resultsConstant[i+1] = 1
+        else:
+            Sta.resultsConstant[i+1] = 20/scale[i]
 
-        Sta.min[member].append(minnormal[casemin])
-        Sta.min[member].append(casemin)
 
-    for member in range(len(Sta.membersList)):
-        maxshear = np.zeros(n1-n0)
-        minshear = np.zeros(n1-n0)
-        for case in range(n0, n1):
-            imax = np.argmax(Sta.forces[case][member][1])
-            imin = np.argmin(Sta.forces[case][member][1])
+def maxmin(Sta):
+    '''
+    Picks the maxima and minima of the internal forces for each member,
+    across all COMBINATIONS, all loadcases or both, from the envelopes.
+    Sta.max and Sta.min keep the [value, case] pairs of N, V and M of each
+    member, with the cases counted from the first one considered;
+    Sta.maxStations and Sta.minStations the values and cases at every
+    station of Sta.envelope[0], as (nmembers, 3, nstations) arrays.
+    '''
+    maxType = Sta.maxType.get()
+    groups = [[0, 1], [0], [1]][maxType]
+    n0 = [0, 0, len(Sta.loadcasesList)][maxType]
 
-            maxshear[case-n0] = Sta.forces[case][member][1][imax]
-            minshear[case-n0] = Sta.forces[case][member][1][imin]
+    values, cases = Sta.envelope[1][groups], Sta.envelope[2][groups]
+    i = np.argmax(values, axis=0)[None]
+    values = np.take_along_axis(values, i, axis=0)[0]
+    cases = np.take_along_axis(cases, i, axis=0)[0] - n0
 
-        casemax = np.argmax(maxshear)
-        Sta.max[member].append(maxshear[casemax])
-        Sta.max[member].append(casemax)
+    # Back to the minima; stations out of the members (and empty groups)
+    # have no value
+    values[1] = -values[1]
+    cases[np.isinf(values)] = -1
+    values[np.isinf(values)] = np.nan
 
-        casemin = np.argmin(minshear)
-        Sta.min[member].append(minshear[casemin])
-        Sta.min[member].append(casemin)
+    Sta.max = [[] for i in range(len(Sta.membersList))]
+    Sta.min = [[] for i in range(len(Sta.membersList))]
 
     for member in range(len(Sta.membersList)):
-        maxbend = np.zeros(n1-n0)
-        minbend = np.zeros(n1-n0)
-        for case in range(n0, n1):
-            imax = np.argmax(Sta.forces[case][member][2])
-            imin = np.argmin(Sta.forces[case][member][2])
-
-            maxbend[case-n0] = Sta.forces[case][member][2][imax]
-            minbend[case-n0] = Sta.forces[case][member][2][imin]
-
-        casemax = np.argmax(maxbend)
-        Sta.max[member].append(maxbend[casemax])
-        Sta.max[member].append(casemax)
-
-        casemin = np.argmin(minbend)
-        Sta.min[member].append(minbend[casemin])
-        Sta.min[member].append(casemin)
-
-    nscale = max(np.amax(np.absolute(maxnormal)),
-                 np.amax(np.absolute(minnormal)))
-    vscale = max(np.amax(np.absolute(maxshear)),
-                 np.amax(np.absolute(minshear)))
-    mscale = max(np.amax(np.absolute(maxbend)),
-                 np.amax(np.absolute(minbend)))
-
-    if nscale == 0:
-        Sta.resultsConstant[1] = 1
-    else:
-        Sta.resultsConstant[1] = np.absolute(20/nscale)
-
-    if vscale == 0:
-        Sta.resultsConstant[2] = 1
-    else:
-        Sta.resultsConstant[2] = np.absolute(20/vscale)
-
-    if mscale == 0:
-        Sta.resultsConstant[3] = 1
-    else:
-        Sta.resultsConstant[3] = np.absolute(20/mscale)
+        for i in range(3):
+            Sta.max[member] += [values[0, member, i, 0],
+                                int(cases[0, member, i, 0])]
+            Sta.min[member] += [values[1, member, i, 0],
+                                int(cases[1, member, i, 0])]
+
+    Sta.maxStations = [values[0, :, :, 1:], cases[0, :, :, 1:]]
+    Sta.minStations = [values[1, :, :, 1:], cases[1, :, :, 1:]]
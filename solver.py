@@ -0,0 +1,756 @@
+'''
+SOLVER MODULE - Contains the global stiffness matrix assembly and the
+linear system backends used by the analysis.
+'''
+
+import numpy as np
+
+try:
+    from scipy import linalg as sclinalg, sparse
+    from scipy.sparse import linalg as splinalg
+except ImportError:
+    sclinalg, sparse = None, None
+
+# Number of free DOFs above which the sparse backend is picked automatically
+SPARSE_THRESHOLD = 300
+# Number of columns in each block of the skyline storage
+SKYLINE_BLOCK = 64
+# Largest number of DOFs a factorization is updated on (Woodbury): above
+# it, the dense (ndof, r) update costs more than factorizing again
+UPDATE_RANK = 64
+# Error of a stiffness matrix that can not be solved, by any method
+UNSTABLE = ('The stiffness matrix is singular: the structure is unstable '
+            '(a mechanism).')
+
+
+def backend(ndof):
+    '''
+    Decides which backend solves a system with ndof free DOFs: sparse if
+    SciPy is available, otherwise the NumPy skyline solver.
+    '''
+    if ndof <= SPARSE_THRESHOLD:
+        return 'dense'
+    if sparse is not None:
+        return 'sparse'
+    return 'skyline'
+
+
+def rcm(nnodes, edges):
+    '''
+    Finds the Reverse Cuthill-McKee ordering of the nodes, for the graph
+    given by the (nedges, 2) node pairs. Each connected part is searched
+    breadth-first from its lowest degree node, visiting neighbours by
+    increasing degree. Returns the nodes in their new order.
+    '''
+    edges = np.asarray(edges, dtype=int).reshape(-1, 2)
+    rows = np.concatenate([edges[:, 0], edges[:, 1]])
+    cols = np.concatenate([edges[:, 1], edges[:, 0]])
+    degree = np.bincount(rows, minlength=nnodes)
+
+    # Adjacency lists, each one sorted by the neighbours' degrees
+    cols = cols[np.lexsort((degree[cols], rows))].tolist()
+    start = np.concatenate([[0], np.cumsum(degree)]).tolist()
+
+    visited = [False]*nnodes
+    order = []
+    for root in np.argsort(degree, kind='stable').tolist():
+        if visited[root]:
+            continue
+        visited[root] = True
+        i = len(order)
+        order.append(root)
+        while i < len(order):
+            node = order[i]
+            for k in cols[start[node]:start[node+1]]:
+                if not visited[k]:
+                    visited[k] = True
+                    order.append(k)
+            i += 1
+
+    return np.array(order[::-1], dtype=int)
+
+
+def bandwidth(MemberDOF):
+    '''
+    Finds the semi-bandwidth of the global stiffness matrix, that is, the
+    largest difference between two free DOF numbers of the same member.
+    '''
+    MemberDOF = np.asarray(MemberDOF, dtype=int).reshape(-1, 6)
+    valid = MemberDOF >= 0
+    if not valid.any():
+        return 0
+
+    high = np.where(valid, MemberDOF, -1).max(axis=1)
+    low = np.where(valid, MemberDOF, high[:, None]).min(axis=1)
+    return int(np.max(high - low))
+
+
+def profile(MemberDOF, ndof, nb=SKYLINE_BLOCK):
+    '''
+    Finds the skyline of the stiffness matrix from the member DOF maps: the
+    top row of every column, taken per block of nb columns and rounded
+    down to the block grid. Returns the top row of each block.
+    '''
+    MemberDOF = np.asarray(MemberDOF, dtype=int).reshape(-1, 6)
+    valid = MemberDOF >= 0
+    low = np.where(valid, MemberDOF, ndof).min(axis=1)
+
+    # Top row of each column: the lowest DOF sharing a member with it
+    top = np.arange(ndof)
+    np.minimum.at(top, MemberDOF[valid], np.repeat(low, valid.sum(axis=1)))
+
+    if ndof == 0:
+        return top
+    return np.minimum.reduceat(top, np.arange(0, ndof, nb)) // nb * nb
+
+
+def pack(ndof, rows, cols, vals, top, nb=SKYLINE_BLOCK):
+    '''
+    Stores the (rows, cols, vals) triplets as a skyline matrix, the list
+    [store, top, offsets, ndof, nb]: the upper triangle, by blocks of nb
+    columns, each block holding the rows from its top row down. Entries
+    above the top rows are dropped.
+    '''
+    start = np.arange(0, ndof, nb)
+    width = np.minimum(nb, ndof - start)
+    offsets = np.concatenate([[0], np.cumsum((start+width-top)*width)])
+
+    J = cols // nb
+    kept = (rows <= cols) & (rows >= top[J])
+    rows, cols, vals, J = rows[kept], cols[kept], vals[kept], J[kept]
+
+    k = offsets[J] + (rows-top[J])*width[J] + cols - J*nb
+    store = np.bincount(k, weights=vals, minlength=offsets[-1])
+    return [store, top, offsets, ndof, nb]
+
+
+def triplets(MemberDOF, SList):
+    '''
+    Builds the COO triplets (rows, columns, values) of the member stiffness
+    matrices, keeping only the entries that fall on free DOFs.
+    '''
+    MemberDOF = np.asarray(MemberDOF, dtype=int).reshape(-1, 6)
+    SList = np.asarray(SList, dtype=float).reshape(-1, 6, 6)
+
+    rows = np.repeat(MemberDOF, 6, axis=1).ravel()
+    cols = np.tile(MemberDOF, (1, 6)).ravel()
+    vals = SList.reshape(-1)
+
+    valid = (rows >= 0) & (cols >= 0)
+    return rows[valid], cols[valid], vals[valid]
+
+
+def scatter(MemberDOF, values, ndof):
+    '''
+    Adds the member end values, shaped (..., nmembers, 6), into global
+    vectors shaped (..., ndof), skipping the restrained DOFs.
+    '''
+    rows = np.asarray(MemberDOF, dtype=int).ravel()
+    values = np.asarray(values, dtype=float)
+    lead = values.shape[:-2]
+    values = values.reshape((-1, rows.size))
+
+    valid = rows >= 0
+    r = [np.bincount(rows[valid], weights=v[valid], minlength=ndof)
+         for v in values]
+    return np.reshape(r, lead + (ndof,))
+
+
+def entries(MemberDOF, SList, DOF, springs):
+    '''
+    Builds the COO triplets of the global stiffness matrix: the member
+    stiffness matrices plus the spring constants on the diagonal.
+    '''
+    rows, cols, vals = triplets(MemberDOF, SList)
+
+    DOF = np.asarray(DOF, dtype=int)
+    springs = np.asarray(springs, dtype=float)
+    free = DOF >= 0
+    rows = np.concatenate([rows, DOF[free]])
+    cols = np.concatenate([cols, DOF[free]])
+    vals = np.concatenate([vals, springs[free]])
+    return rows, cols, vals
+
+
+def assemble(ndof, MemberDOF, SList, DOF, springs, kind='dense'):
+    '''
+    Assembles the global stiffness matrix, including the spring constants,
+    as a dense array, a sparse CSC matrix or a skyline matrix, that is, the
+    list [store, top, offsets, ndof, nb] of its upper profile.
+    '''
+    rows, cols, vals = entries(MemberDOF, SList, DOF, springs)
+
+    if kind == 'sparse':
+        # Duplicate entries are summed on conversion
+        return sparse.coo_matrix((vals, (rows, cols)),
+                                 shape=(ndof, ndof)).tocsc()
+
+    if kind == 'skyline':
+        return pack(ndof, rows, cols, vals, profile(MemberDOF, ndof))
+
+    K = np.zeros((ndof, ndof))
+    np.add.at(K, (rows, cols), vals)
+    return K
+
+
+def structure(ndof, MemberDOF, DOF, kind='dense'):
+    '''
+    Precomputes the assembly of the global stiffness matrix, which depends
+    only on the connectivity: the storage position (slot) of every member
+    and spring entry. For the sparse backend, the fill-reducing ordering
+    is found here once, and the matrix is stored already reordered.
+    Returns [kind, ndof, slots, size, layout, select, order].
+    '''
+    MemberDOF = np.asarray(MemberDOF, dtype=int).reshape(-1, 6)
+    DOF = np.asarray(DOF, dtype=int)
+    rows, cols, vals = entries(MemberDOF, np.ones((len(MemberDOF), 6, 6)),
+                               DOF, np.ones(len(DOF)))
+    select, layout, order = np.ones(len(rows), dtype=bool), None, None
+
+    if kind == 'sparse':
+        # Ordering of a diagonally dominant matrix with the same pattern
+        count = np.bincount(rows, minlength=ndof)
+        A = sparse.coo_matrix((np.where(rows == cols, count[rows], -1.0),
+                               (rows, cols)), shape=(ndof, ndof)).tocsc()
+        perm = splinalg.splu(A, permc_spec='MMD_AT_PLUS_A',
+                             diag_pivot_thresh=0,
+                             options=dict(SymmetricMode=True)).perm_c
+        order = np.argsort(perm)
+        rows, cols = perm[rows], perm[cols]
+
+        key, slots = np.unique(cols*ndof + rows, return_inverse=True)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(key // ndof,
+                                                            minlength=ndof))])
+        layout = [key % ndof, indptr]
+        size = len(key)
+
+    elif kind == 'skyline':
+        nb = SKYLINE_BLOCK
+        top = profile(MemberDOF, ndof, nb)
+        start = np.arange(0, ndof, nb)
+        width = np.minimum(nb, ndof - start)
+        offsets = np.concatenate([[0], np.cumsum((start+width-top)*width)])
+
+        J = cols // nb
+        select = rows <= cols
+        rows, cols, J = rows[select], cols[select], J[select]
+        slots = offsets[J] + (rows-top[J])*width[J] + cols - J*nb
+        layout = [top, offsets, nb]
+        size = offsets[-1]
+
+    else:
+        slots, size = rows*ndof + cols, ndof*ndof
+
+    return [kind, ndof, slots, size, layout, select, order]
+
+
+def fill(S, MemberDOF, SList, DOF, springs):
+    '''
+    Assembles the global stiffness matrix on a precomputed structure S:
+    only the values are summed into their slots.
+    '''
+    kind, ndof, slots, size, layout, select = S[:6]
+    vals = entries(MemberDOF, SList, DOF, springs)[2][select]
+    data = np.bincount(slots, weights=vals, minlength=size)
+
+    if kind == 'sparse':
+        return sparse.csc_matrix((data, layout[0], layout[1]),
+                                 shape=(ndof, ndof))
+    if kind == 'skyline':
+        return [data, layout[0], layout[1], ndof, layout[2]]
+    return data.reshape(ndof, ndof)
+
+
+def refactorize(S, K):
+    '''
+    Factorizes a matrix assembled on the structure S, reusing its ordering
+    (only the numeric factorization is done). Returns a solve function, as
+    factorize does, in the original DOF order.
+    '''
+    if S[0] != 'sparse':
+        return factorize(K)
+
+    order = S[6]
+    position = np.argsort(order)
+    solve = factorize(K, ordered=True)
+    return lambda F: solve(np.asarray(F)[order])[position]
+
+
+def lowRank(MemberDOF, SList, DOF=None, springs=None):
+    '''
+    Assembles the stiffness matrices of a few members, and the spring
+    constants if given, into a dense (r, r) matrix over the r free DOFs
+    they touch. Returns [J, D], J being the sorted DOFs and D the matrix.
+    '''
+    if springs is None:
+        rows, cols, vals = triplets(MemberDOF, SList)
+    else:
+        rows, cols, vals = entries(MemberDOF, SList, DOF, springs)
+        rows, cols, vals = rows[vals != 0], cols[vals != 0], vals[vals != 0]
+    J = np.unique(rows)
+    r = len(J)
+    index = np.searchsorted(J, rows)*r + np.searchsorted(J, cols)
+    return [J, np.bincount(index, vals, r*r).reshape(r, r)]
+
+
+def woodbury(solve, Z, J, D):
+    '''
+    Returns a solve function for the matrix K0 + E D E', E selecting the
+    DOFs J and D being a (r, r) update, from the solve function of K0 and
+    Z = K0^-1 E, shaped (ndof, r) (Sherman-Morrison-Woodbury identity).
+    '''
+    M = np.eye(len(J)) + np.dot(D, Z[J])
+
+    def solveUpdated(F):
+        x = solve(F)
+        return x - np.dot(Z, np.linalg.solve(M, np.dot(D, x[J])))
+
+    return solveUpdated
+
+
+def updatable(factor, J):
+    '''
+    Tells whether a factorization [solve, Z, ZJ] can be updated on the DOFs
+    J, that is, whether Z stays within UPDATE_RANK columns.
+    '''
+    return len(np.union1d(factor[2], J)) <= UPDATE_RANK
+
+
+def updated(factor, J, D):
+    '''
+    Returns a solve function for the matrix of a factorization [solve, Z,
+    ZJ] updated by D on the DOFs J (see woodbury). Z holds the columns of
+    K0^-1 already computed for the DOFs ZJ, and it is extended in place
+    only for the DOFs not used before.
+    '''
+    solve, Z, ZJ = factor
+    if len(J) == 0:
+        return solve
+
+    new = np.setdiff1d(J, ZJ)
+    if len(new) > 0:
+        E = np.zeros((Z.shape[0], len(new)))
+        E[new, np.arange(len(new))] = 1
+        factor[1], factor[2] = np.hstack([Z, solve(E)]), np.append(ZJ, new)
+        Z, ZJ = factor[1], factor[2]
+
+    index = np.argsort(ZJ)
+    index = index[np.searchsorted(ZJ[index], J)]
+    return woodbury(solve, Z[:, index], J, D)
+
+
+def factorize(K, ordered=False):
+    '''
+    Factorizes the global stiffness matrix once, returning a function that
+    solves the system for a forces vector or for a (ndof, ncases) block
+    of forces vectors. An ordered sparse matrix is factorized as it is.
+    '''
+    if isinstance(K, list):
+        # Pivoting only within the diagonal blocks of the skyline: converting
+        # to a dense matrix for LU would take ndof*ndof memory, on the
+        # models this storage is for
+        try:
+            U = skyline(K)
+        except np.linalg.LinAlgError:
+            raise np.linalg.LinAlgError(UNSTABLE) from None
+        return lambda F: skylineSolve(U, K, F)
+
+    if sparse is not None and sparse.issparse(K):
+        # Symmetric mode (diagonal pivots) keeps the fill-in of the
+        # minimum degree ordering; if a pivot vanishes, plain COLAMD
+        K = sparse.csc_matrix(K)
+        try:
+            lu = splinalg.splu(K, permc_spec='NATURAL' if ordered else
+                               'MMD_AT_PLUS_A',
+                               diag_pivot_thresh=0,
+                               options=dict(SymmetricMode=True))
+        except RuntimeError:
+            lu = splinalg.splu(K, permc_spec='COLAMD')
+        return lu.solve
+
+    if sclinalg is not None:
+        try:
+            c = sclinalg.cho_factor(K, check_finite=False)
+            return lambda F: sclinalg.cho_solve(c, F, check_finite=False)
+        except np.linalg.LinAlgError:
+            # Not positive definite (e.g. negative springs): plain LU
+            lu = sclinalg.lu_factor(K, check_finite=False)
+            return lambda F: sclinalg.lu_solve(lu, F, check_finite=False)
+
+    # NumPy only: LU factorization shared by all the columns of the block
+    return lambda F: np.linalg.solve(K, F)
+
+
+def blocks(K):
+    '''
+    Splits the skyline storage into its (height, width) column blocks.
+    '''
+    store, top, offsets, ndof, nb = K
+    return [store[offsets[J]:offsets[J+1]].reshape(-1, min(nb, ndof-J*nb))
+            for J in range(len(top))]
+
+
+def skyline(K):
+    '''
+    Block LDL' factorization K = V'DV of a skyline matrix, one block column
+    at a time (left-looking): V is unit upper triangular by blocks and D
+    block diagonal, so K need not be positive definite (only the dense
+    solves with the blocks of D pivot). The zeros above the skyline are
+    never filled. Returns the block columns, holding the blocks of V above
+    the diagonal and the inverses of the blocks of D on it.
+    '''
+    top, nb = K[1], K[4]
+    U = []
+    for J, A in enumerate(blocks(K)):
+        A, t = A.copy(), top[J]
+        j0 = J*nb
+
+        # Blocks of DV above the diagonal, less the contributions of the
+        # rows above (V' of the block column I times DV of this one)
+        for I in range(t // nb, J):
+            i0, B = I*nb, U[I]
+            k0 = max(top[I], t)
+            if k0 < i0:
+                A[i0-t:i0-t+nb] -= np.dot(B[k0-top[I]:i0-top[I]].T,
+                                          A[k0-t:i0-t])
+
+        # Blocks of V, and the diagonal block of D (stored upper triangle)
+        DV = A[:j0-t].copy()
+        for I in range(t // nb, J):
+            i0 = I*nb
+            A[i0-t:i0-t+nb] = np.dot(U[I][i0-top[I]:], DV[i0-t:i0-t+nb])
+        D = np.triu(A[j0-t:])
+        D += np.triu(D, 1).T - np.dot(A[:j0-t].T, DV)
+        A[j0-t:] = np.linalg.inv(D)
+        U.append(A)
+    return U
+
+
+def skylineSolve(U, K, F):
+    '''
+    Solves V'DV x = F, with V and D the factors of the skyline matrix K, by
+    forward substitution, block diagonal solves and back substitution, for
+    a forces vector or for a (ndof, ncases) block of forces vectors.
+    '''
+    top, nb = K[1], K[4]
+    x = np.array(F, dtype=float)
+    shape = x.shape
+    x = x.reshape(shape[0], -1)
+
+    # Forward substitution: V'y = F
+    for J, B in enumerate(U):
+        j0, j1, t = J*nb, J*nb+B.shape[1], top[J]
+        if t < j0:
+            x[j0:j1] -= np.dot(B[:j0-t].T, x[t:j0])
+
+    # Block diagonal: Dz = y
+    for J, B in enumerate(U):
+        j0, j1, t = J*nb, J*nb+B.shape[1], top[J]
+        x[j0:j1] = np.dot(B[j0-t:], x[j0:j1])
+
+    # Back substitution: Vx = z
+    for J in range(len(U)-1, -1, -1):
+        B = U[J]
+        j0, j1, t = J*nb, J*nb+B.shape[1], top[J]
+        if t < j0:
+            x[t:j0] -= np.dot(B[:j0-t], x[j0:j1])
+
+    return x.reshape(shape)
+
+
+def tridiagonal(diag, off, F):
+    '''
+    Solves a stack of symmetric tridiagonal systems: diag (nsystems, n) and
+    off (nsystems, n-1) hold their diagonals and F (nsystems, n, nrhs) the
+    right hand sides. With SciPy the stack is solved as a single banded
+    system (the terms coupling two systems being zero), otherwise by the
+    Thomas algorithm, vectorized over the systems.
+    '''
+    nsystems, n = diag.shape
+    if sclinalg is not None:
+        upper = np.zeros((nsystems, n))
+        upper[:, :-1] = off
+        ab = np.zeros((3, nsystems*n))
+        ab[0, 1:] = ab[2, :-1] = upper.ravel()[:-1]
+        ab[1] = diag.ravel()
+        x = sclinalg.solve_banded((1, 1), ab, F.reshape(nsystems*n, -1))
+        return x.reshape(F.shape)
+
+    # Forward elimination
+    c, x = np.zeros((nsystems, n)), np.array(F, dtype=float)
+    w = diag[:, 0]
+    for i in range(n):
+        if i > 0:
+            w = diag[:, i] - off[:, i-1]*c[:, i-1]
+            x[:, i] -= off[:, i-1, None]*x[:, i-1]
+        if i < n-1:
+            c[:, i] = off[:, i]/w
+        x[:, i] /= w[:, None]
+
+    # Back substitution
+    for i in range(n-2, -1, -1):
+        x[:, i] -= c[:, i, None]*x[:, i+1]
+    return x
+
+
+def operator(ndof, MemberDOF, SList, DOF, springs):
+    '''
+    Creates the product of the global stiffness matrix by a (ndof, ncases)
+    block of vectors: a CSR mat-vec if SciPy is available, otherwise
+    computed member by member without assembling the matrix. Returns
+    [product, diagonal], the function and the diagonal of the matrix.
+    '''
+    MemberDOF = np.asarray(MemberDOF, dtype=int).reshape(-1, 6)
+    SList = np.asarray(SList, dtype=float).reshape(-1, 6, 6)
+    DOF = np.asarray(DOF, dtype=int)
+
+    free = DOF >= 0
+    kspring = np.zeros(ndof)
+    kspring[DOF[free]] = np.asarray(springs, dtype=float)[free]
+    diagonal = scatter(MemberDOF, np.diagonal(SList, axis1=1, axis2=2), ndof)
+
+    if sparse is not None:
+        rows, cols, vals = entries(MemberDOF, SList, DOF, springs)
+        K = sparse.csr_matrix((vals, (rows, cols)), shape=(ndof, ndof))
+        return [lambda X: K.dot(X), diagonal + kspring]
+
+    # Restrained member ends read a zero row appended to the vectors
+    index = np.where(MemberDOF >= 0, MemberDOF, ndof)
+
+    def product(X):
+        Xm = np.vstack([X, np.zeros((1, X.shape[1]))])[index]
+        Y = np.einsum('mij,mjn->nmi', SList, Xm)
+        return scatter(MemberDOF, Y, ndof).T + kspring[:, None]*X
+
+    return [product, diagonal + kspring]
+
+
+def levels(owner, other, n, reverse=False):
+    '''
+    Level scheduling of a triangular sparse matrix, given by the (owner,
+    other) indices of its entries, the diagonal included: the level of an
+    index is one more than the highest level of the other indices in its
+    entries (lower ones, or higher if reverse), so the indices of a level
+    only depend on those of the levels before. Returns [order, entries,
+    starts, bounds, ebounds]: the indices by level, their entries in the
+    same order, where the entries of each index start, and where each
+    level starts in order and in entries.
+    '''
+    ptr = np.concatenate([[0], np.cumsum(np.bincount(owner, minlength=n))])
+    other = other[np.lexsort((other, owner))].tolist()
+    ptr = ptr.tolist()
+
+    level = [-1]*n
+    for i in (range(n-1, -1, -1) if reverse else range(n)):
+        level[i] = 1 + max([level[k] for k in other[ptr[i]:ptr[i+1]]])
+    level = np.array(level, dtype=int)
+
+    order = np.argsort(level, kind='stable')
+    entries = np.lexsort((owner, level[owner]))
+    starts = np.cumsum(np.bincount(owner, minlength=n)[order])
+    steps = np.arange(level.max(initial=-1)+2)
+    bounds = np.searchsorted(level[order], steps)
+    ebounds = np.searchsorted(level[owner][entries], steps)
+    return [order, entries, np.concatenate([[0], starts[:-1]]), bounds,
+            ebounds]
+
+
+def ichol(ndof, rows, cols, vals):
+    '''
+    Incomplete Cholesky factorization without fill-in, IC(0): the factor L
+    keeps the pattern of the lower triangle of the matrix. Returns L in CSR
+    form, [indptr, indices, data], with the diagonal last in each row, plus
+    the steps of the triangular solves with L and L' (see levelSteps).
+    Raises LinAlgError on a non-positive pivot.
+
+    Right-looking, a level of columns at a time: the columns of a level do
+    not update each other, so each level takes a few vectorized steps.
+    '''
+    lower = rows >= cols
+    key, inverse = np.unique(rows[lower]*ndof + cols[lower],
+                             return_inverse=True)
+    data = np.bincount(inverse, weights=vals[lower])
+    rows, cols = key // ndof, key % ndof
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows,
+                                                        minlength=ndof))])
+    diagonal = indptr[1:] - 1
+    forward = levels(rows, cols, ndof)
+    steps = np.arange(len(forward[3]))
+    level = np.empty(ndof, dtype=int)
+    level[forward[0]] = np.repeat(steps[:-1], np.diff(forward[3]))
+
+    # Entries below the diagonal, by column (and row), and the pairs of
+    # them in each column, (i, k) and (j, k) with j <= i, updating (i, j)
+    below = np.flatnonzero(rows > cols)
+    below = below[np.lexsort((rows[below], cols[below]))]
+    first = np.searchsorted(cols[below], cols[below])
+    count = np.arange(len(below)) - first + 1
+    P = np.repeat(below, count)
+    Q = below[np.repeat(first, count) + np.arange(count.sum()) -
+              np.repeat(np.cumsum(count) - count, count)]
+    target = rows[P]*ndof + rows[Q]
+    T = np.minimum(np.searchsorted(key, target), len(key)-1)
+    kept = key[T] == target
+    P, Q, T = P[kept], Q[kept], T[kept]
+
+    # Everything by level of the column
+    below = below[np.argsort(level[cols[below]], kind='stable')]
+    pairs = np.argsort(level[cols[P]], kind='stable')
+    P, Q, T = P[pairs], Q[pairs], T[pairs]
+    group, inverse = np.unique(level[cols[P]]*len(key) + T,
+                               return_inverse=True)
+    bbounds = np.searchsorted(level[cols[below]], steps)
+    pbounds = np.searchsorted(level[cols[P]], steps)
+    gbounds = np.searchsorted(group // len(key), steps)
+    group = group % len(key)
+
+    for n in range(len(steps)-1):
+        d = diagonal[forward[0][forward[3][n]:forward[3][n+1]]]
+        if not np.all(data[d] > 0):
+            raise np.linalg.LinAlgError('Non-positive pivot in IC(0).')
+        data[d] = np.sqrt(data[d])
+
+        b = below[bbounds[n]:bbounds[n+1]]
+        data[b] /= data[diagonal[cols[b]]]
+
+        p0, p1, g0, g1 = pbounds[n], pbounds[n+1], gbounds[n], gbounds[n+1]
+        data[group[g0:g1]] -= np.bincount(inverse[p0:p1]-g0,
+                                          data[P[p0:p1]]*data[Q[p0:p1]],
+                                          g1-g0)
+
+    backward = levels(cols, rows, ndof, True)
+    return [indptr, cols, data, levelSteps(forward, cols, data, diagonal),
+            levelSteps(backward, rows, data, diagonal)]
+
+
+def levelSteps(schedule, other, data, diagonal):
+    '''
+    Splits a triangular system by the levels of its schedule (see levels):
+    for each level, its unknowns, the unknowns and values of their entries,
+    where the entries of each unknown start, and their diagonal values.
+    '''
+    order, entries, starts, bounds, ebounds = schedule
+    steps = []
+    for n in range(len(bounds)-1):
+        i = order[bounds[n]:bounds[n+1]]
+        e = entries[ebounds[n]:ebounds[n+1]]
+        steps.append([i, other[e], data[e, None],
+                      starts[bounds[n]:bounds[n+1]]-ebounds[n],
+                      data[diagonal[i], None]])
+    return steps
+
+
+def levelSolve(steps, R):
+    '''
+    Solves a triangular system, a level of unknowns at a time (see
+    levelSteps), for a (ndof, ncases) block; the entries of each unknown
+    include its diagonal, which meets the unknown while it is still zero.
+    '''
+    x = np.zeros(R.shape)
+    for i, other, values, starts, diagonal in steps:
+        x[i] = (R[i] - np.add.reduceat(values*x[other], starts))/diagonal
+    return x
+
+
+def icholSolve(L, R):
+    '''
+    Solves L L' x = R, with L from ichol, for a (ndof, ncases) block.
+    '''
+    indptr, indices, data, forward, backward = L
+    ndof = len(indptr) - 1
+
+    if sparse is not None:
+        L = sparse.csr_matrix((data, indices, indptr), shape=(ndof, ndof))
+        y = splinalg.spsolve_triangular(L, R, lower=True)
+        return splinalg.spsolve_triangular(L.T.tocsr(), y, lower=False)
+
+    return levelSolve(backward, levelSolve(forward, np.asarray(R, float)))
+
+
+def preconditioner(ndof, MemberDOF, SList, DOF, springs, diagonal,
+                   kind='jacobi'):
+    '''
+    Creates the preconditioner of the conjugate gradient method, as a
+    function applied to a block of residuals: either the inverse of the
+    diagonal (jacobi) or an incomplete Cholesky factorization (cholesky).
+    If IC(0) breaks down, the diagonal is increased until it does not.
+    '''
+    d = np.where(diagonal > 0, diagonal, 1)
+    if kind == 'cholesky':
+        rows, cols, vals = entries(MemberDOF, SList, DOF, springs)
+        rows = np.concatenate([rows, np.arange(ndof)])
+        cols = np.concatenate([cols, np.arange(ndof)])
+
+        shift = 0
+        while shift < 1:
+            try:
+                L = ichol(ndof, rows, cols, np.concatenate([vals, shift*d]))
+                return lambda R: icholSolve(L, R)
+            except np.linalg.LinAlgError:
+                shift = 2*shift if shift else 1e-3
+
+    return lambda R: R/d[:, None]
+
+
+def pcg(ndof, MemberDOF, SList, DOF, springs, F, tol, kind='jacobi',
+        maxiter=None):
+    '''
+    Solves the system by the preconditioned conjugate gradient method for
+    a (ndof, ncases) block of forces vectors, iterating on all the columns
+    at once; each column stops once its residual, relative to its forces
+    vector, is below tol. Returns [displacements, iterations, residuals],
+    with the iterations and the final relative residual of each column.
+
+    Raises LinAlgError (as the skyline solver) if the matrix turns out to
+    be singular: a search direction without curvature, to machine
+    precision, or a residual that stops improving for ndof iterations (100
+    at least).
+    '''
+    product, diagonal = operator(ndof, MemberDOF, SList, DOF, springs)
+    precondition = preconditioner(ndof, MemberDOF, SList, DOF, springs,
+                                  diagonal, kind)
+    if maxiter is None:
+        maxiter = 10*ndof
+
+    F = np.array(F, dtype=float)
+    shape = F.shape
+    F = F.reshape(ndof, -1)
+    norm = np.linalg.norm(F, axis=0)
+    norm[norm == 0] = 1
+
+    X = np.zeros(F.shape)
+    R = F.copy()
+    Z = precondition(R)
+    P = Z.copy()
+    rz = np.sum(R*Z, axis=0)
+
+    iterations = np.zeros(F.shape[1], dtype=int)
+    best = np.linalg.norm(R, axis=0)/norm
+    active, stalled = best > tol, np.zeros(F.shape[1], dtype=int)
+    # Curvature (p'Kp/p'p) below which the matrix is taken as singular
+    flat = np.finfo(float).eps*np.max(diagonal, initial=0)
+    for i in range(maxiter):
+        if not active.any():
+            break
+        Q = product(P)
+        pq = np.sum(P*Q, axis=0)
+        if np.any(active & (pq <= flat*np.sum(P*P, axis=0))):
+            raise np.linalg.LinAlgError(UNSTABLE)
+        alpha = np.where(active, rz/np.where(pq != 0, pq, 1), 0)
+        X += alpha*P
+        R -= alpha*Q
+
+        iterations += active
+        residual = np.linalg.norm(R, axis=0)/norm
+        active &= residual > tol
+        stalled = np.where(residual < best, 0, stalled+1)
+        best = np.minimum(best, residual)
+        if np.any(active & (stalled > max(ndof, 100))):
+            raise np.linalg.LinAlgError(UNSTABLE)
+
+        Z = precondition(R)
+        rz, rzold = np.sum(R*Z, axis=0), rz
+        P = Z + rz/np.where(rzold != 0, rzold, 1)*P
+
+    residuals = np.linalg.norm(F - product(X), axis=0)/norm
+    return [X.reshape(shape), iterations, residuals]